@@ -0,0 +1,68 @@
+"""Fixtures for the benchmarks.
+
+The benchmarks use pytest-benchmark, run them with `tox -e benchmark`, or with
+`pytest benchmarks` after installing pytest-benchmark.
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from dymoprint.lib.dymo_print_engines import DymoRenderEngine
+from dymoprint.lib.font_config import FontConfig
+from dymoprint.lib.label_spec import LabelSpec, render_label_spec
+
+
+class FakeEndpoint:
+    """A stand-in for a USB endpoint of the printer.
+
+    Writes are counted and discarded, and reads return an all-zero status, so that
+    DymoLabeler runs without a printer and without waiting for one.
+    """
+
+    def __init__(self) -> None:
+        self.num_bytes = 0
+        self.num_writes = 0
+        self.num_reads = 0
+
+    def write(self, data: bytes) -> int:
+        self.num_bytes += len(data)
+        self.num_writes += 1
+        return len(data)
+
+    def read(self, size: int, timeout: int | None = None) -> bytes:
+        self.num_reads += 1
+        return bytes(size)
+
+
+@pytest.fixture
+def devout() -> FakeEndpoint:
+    return FakeEndpoint()
+
+
+@pytest.fixture
+def devin() -> FakeEndpoint:
+    return FakeEndpoint()
+
+
+@pytest.fixture(scope="session")
+def font_file_name() -> str:
+    return str(FontConfig().path)
+
+
+@pytest.fixture(params=["freetype", "atlas"])
+def render_engine(request) -> DymoRenderEngine:
+    """Return a render engine for 12 mm tape, without a render cache."""
+    return DymoRenderEngine(12, text_backend=request.param)
+
+
+@pytest.fixture(scope="session")
+def label_bitmap(font_file_name):
+    """Render a label of about 10 cm with a QR code and two lines of text."""
+    spec = LabelSpec(
+        text_lines=["The quick brown fox jumps", "over the lazy dog 0123456789"],
+        font_file_name=font_file_name,
+        qr="https://github.com/computerlyrik/dymoprint",
+        min_payload_len_px=700,
+    )
+    return render_label_spec(DymoRenderEngine(12), spec)
@@ -0,0 +1,14 @@
+"""Previews of labels in the terminal."""
+
+from __future__ import annotations
+
+import pytest
+from PIL import Image
+
+from dymoprint.lib.unicode_blocks import image_to_unicode
+
+
+@pytest.mark.parametrize("braille", [False, True])
+def test_image_to_unicode(benchmark, label_bitmap, braille):
+    label_rotated = label_bitmap.transpose(Image.ROTATE_270)
+    benchmark(image_to_unicode, label_rotated, braille=braille)
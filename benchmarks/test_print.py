@@ -0,0 +1,20 @@
+"""Building and sending print commands, against fake USB endpoints."""
+
+from __future__ import annotations
+
+import pytest
+
+from dymoprint.lib.label_raster import LabelRaster
+from dymoprint.lib.labeler import DymoLabeler
+
+
+@pytest.mark.parametrize("synwait", [None, 64])
+def test_print_label(benchmark, label_bitmap, devout, devin, synwait):
+    rows = LabelRaster.from_image(label_bitmap).rows()
+
+    def print_label():
+        labeler = DymoLabeler(devout, devin, synwait=synwait, tape_size_mm=12)
+        labeler.printLabel(list(rows))
+
+    benchmark(print_label)
+    assert devout.num_bytes > len(rows) * len(rows[0])
@@ -0,0 +1,85 @@
+"""Rendering of the label segments."""
+
+from __future__ import annotations
+
+import pytest
+
+from dymoprint.lib.constants import ICON_DIR
+from dymoprint.lib.dymo_print_engines import DymoRenderEngine
+from dymoprint.lib.font_index import DEFAULT_FONTS_DIR
+from dymoprint.lib.label_raster import LabelRaster
+
+
+@pytest.mark.parametrize("num_lines", [1, 2, 3])
+def test_render_text(benchmark, render_engine, font_file_name, num_lines):
+    text_lines = ["Label maker benchmark"] * num_lines
+    benchmark(render_engine.render_text, text_lines, font_file_name, None)
+
+
+def test_render_text_with_fallback(benchmark, render_engine, font_file_name):
+    benchmark(render_engine.render_text, ["Grüße ✓ Привет"], font_file_name, None)
+
+
+@pytest.mark.parametrize(
+    "font_name", ["Carlito-Regular", "Carlito-Italic", "Carlito-BoldItalic"]
+)
+@pytest.mark.parametrize("tape_size_mm", [9, 12])
+@pytest.mark.parametrize(
+    "text_lines",
+    [["WAV 0123456789 !@#"], ["AVAWAY To Ty"], ["ab", "xyzq", "Tj"]],
+)
+@pytest.mark.parametrize("align", ["left", "right"])
+def test_atlas_matches_freetype(font_name, tape_size_mm, text_lines, align):
+    font_file_name = DEFAULT_FONTS_DIR / f"{font_name}.ttf"
+    bitmaps = [
+        DymoRenderEngine(tape_size_mm, text_backend=text_backend).render_text(
+            text_lines, font_file_name, None, align=align
+        )
+        for text_backend in ("freetype", "atlas")
+    ]
+    assert bitmaps[0].size == bitmaps[1].size
+    assert bitmaps[0].tobytes() == bitmaps[1].tobytes()
+
+
+def test_render_qr(benchmark, render_engine):
+    benchmark(render_engine.render_qr, "https://github.com/computerlyrik/dymoprint")
+
+
+@pytest.mark.parametrize("bar_code_type", ["code128", "ean13"])
+def test_render_barcode(benchmark, render_engine, bar_code_type):
+    benchmark(render_engine.render_barcode, "123456789012", bar_code_type)
+
+
+def test_render_barcode_with_text(benchmark, render_engine, font_file_name):
+    benchmark(
+        render_engine.render_barcode_with_text,
+        "123456789012",
+        "code128",
+        font_file_name,
+        None,
+    )
+
+
+def test_render_picture(benchmark, render_engine):
+    benchmark(render_engine.render_picture, str(ICON_DIR / "gui_icon.png"))
+
+
+def test_render_test(benchmark, render_engine):
+    benchmark(render_engine.render_test)
+
+
+def test_merge_render(benchmark, render_engine, font_file_name):
+    bitmaps = [
+        render_engine.render_qr("dymoprint"),
+        render_engine.render_text(["Label", "maker"], font_file_name, None),
+        render_engine.render_barcode("123456789012", "code128"),
+    ]
+    benchmark(render_engine.merge_render, bitmaps=bitmaps, min_payload_len_px=1000)
+
+
+def test_label_raster_from_image(benchmark, label_bitmap):
+    benchmark(LabelRaster.from_image, label_bitmap)
+
+
+def test_label_raster_rows(benchmark, label_bitmap):
+    benchmark(LabelRaster.from_image(label_bitmap).rows)
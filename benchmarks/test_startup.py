@@ -0,0 +1,39 @@
+"""Font discovery and the cold start of the CLI."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+from dymoprint.lib.font_index import FontIndex
+
+
+def test_font_scan(benchmark):
+    benchmark.pedantic(FontIndex.scan, rounds=5)
+
+
+def test_font_index_load(benchmark, tmp_path):
+    path = tmp_path / "font_index.json"
+    FontIndex.load(path)
+    benchmark(FontIndex.load, path)
+
+
+@pytest.mark.parametrize(
+    "args", [["--version"], ["--preview", "text"]], ids=["version", "preview"]
+)
+def test_cli_cold_start(benchmark, args):
+    # Each round starts a fresh interpreter, so nothing is imported yet
+    command = [
+        sys.executable,
+        "-c",
+        "import sys; from dymoprint.cli.cli import main; sys.exit(main())",
+        *args,
+    ]
+    benchmark.pedantic(
+        subprocess.run,
+        args=(command,),
+        kwargs={"check": True, "stdout": subprocess.DEVNULL},
+        rounds=10,
+    )
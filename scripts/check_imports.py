@@ -0,0 +1,83 @@
+"""Check that the CLI starts without importing the dependencies of other features.
+
+Runs the CLI under `python -X importtime`, and fails if any of the modules which
+only some features need were imported. The slowest imports are printed, to help
+finding the culprit.
+
+Usage: python scripts/check_imports.py
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+# Modules which are only needed for printing, barcodes, QR codes, the GUI, or
+# rescanning the fonts
+LAZY_MODULES = (
+    "usb",
+    "barcode",
+    "pyqrcode",
+    "PyQt6",
+    "dymoprint._vendor.matplotlib.font_manager",
+    "webbrowser",
+)
+
+RUN_CLI = "import sys; from dymoprint.cli.cli import main; sys.argv[0] = 'dymoprint'"
+
+CHECKS = {
+    "import": "import dymoprint.cli.cli",
+    "--version": f"{RUN_CLI}; sys.argv[1:] = ['--version']; main()",
+    "--preview": f"{RUN_CLI}; sys.argv[1:] = ['--preview', 'text']; main()",
+}
+
+
+def import_times(statement: str) -> dict[str, tuple[int, int]]:
+    """Run a statement, and return the import depth and time in µs of each module.
+
+    The time includes the imports of the module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        sys.exit(f"Running {statement!r} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            depth = (len(name) - len(name.lstrip())) // 2
+            times[name.strip()] = (depth, int(cumulative))
+    return times
+
+
+def main() -> int:
+    failed = False
+    # The first run may rebuild the font index, which needs the font manager
+    import_times(CHECKS["--preview"])
+    for check, statement in CHECKS.items():
+        times = import_times(statement)
+        eager = [
+            m
+            for m in LAZY_MODULES
+            if any(module == m or module.startswith(f"{m}.") for module in times)
+        ]
+        total_ms = sum(t for depth, t in times.values() if depth == 0) / 1000
+        print(f"{check}: {len(times)} modules imported in {total_ms:.0f} ms")
+        if eager:
+            failed = True
+            print(f"  unexpected imports: {', '.join(eager)}")
+            slowest = sorted(times.items(), key=lambda item: item[1][1], reverse=True)
+            for name, (_, time_us) in slowest[:10]:
+                print(f"  {time_us / 1000:8.1f} ms  {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
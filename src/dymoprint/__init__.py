@@ -1,4 +1,21 @@
-from dymoprint.lib.labeler import DymoLabeler
-from dymoprint.metadata import __version__
+from typing import TYPE_CHECKING
 
-__all__ = ["__version__", "DymoLabeler"]
+if TYPE_CHECKING:
+    from dymoprint.lib.labeler import DymoLabeler
+    from dymoprint.metadata import __version__
+
+__all__ = ["DymoLabeler", "__version__"]
+
+
+def __getattr__(name):
+    # The attributes are imported on first access, so that importing a submodule
+    # doesn't load pyusb and the package metadata.
+    if name == "DymoLabeler":
+        from dymoprint.lib.labeler import DymoLabeler
+
+        return DymoLabeler
+    if name == "__version__":
+        from dymoprint.metadata import __version__
+
+        return __version__
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -24,6 +24,7 @@ Future versions may implement the Level 2 or 2.1 specifications.
 #   - 'light' is an invalid weight value, remove it.
 
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 import logging
 import os
@@ -174,12 +175,23 @@ def list_fonts(directory, extensions):
     Return a list of all fonts matching any of the extensions, found
     recursively under the directory.
     """
-    extensions = ["." + ext for ext in extensions]
-    return [os.path.join(dirpath, filename)
-            # os.walk ignores access errors, unlike Path.glob.
-            for dirpath, _, filenames in os.walk(directory)
-            for filename in filenames
-            if Path(filename).suffix.lower() in extensions]
+    suffixes = tuple("." + ext for ext in extensions)
+    fonts = []
+    directories = [directory]
+    while directories:
+        try:
+            # Like os.walk, ignore directories which can't be read.
+            with os.scandir(directories.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    # is_file follows symlinks, so broken links are skipped.
+                    elif (entry.name.lower().endswith(suffixes)
+                          and entry.is_file()):
+                        fonts.append(entry.path)
+        except OSError:
+            continue
+    return fonts
 
 
 def win32FontDirectory():
@@ -255,24 +267,36 @@ def findSystemFonts(fontpaths=None, fontext='ttf'):
     """
     fontfiles = set()
     fontexts = get_fontext_synonyms(fontext)
+    suffixes = tuple("." + ext for ext in fontexts)
 
     if fontpaths is None:
         if sys.platform == 'win32':
-            installed_fonts = _get_win32_installed_fonts()
+            list_installed_fonts = _get_win32_installed_fonts
             fontpaths = []
         else:
-            installed_fonts = _get_fontconfig_fonts()
+            list_installed_fonts = _get_fontconfig_fonts
             if sys.platform == 'darwin':
                 fontpaths = [*X11FontDirectories, *OSXFontDirectories]
             else:
                 fontpaths = X11FontDirectories
-        fontfiles.update(str(path) for path in installed_fonts
-                         if path.suffix.lower()[1:] in fontexts)
+    else:
+        list_installed_fonts = None
+        if isinstance(fontpaths, str):
+            fontpaths = [fontpaths]
 
-    elif isinstance(fontpaths, str):
-        fontpaths = [fontpaths]
+    # The directories are walked concurrently, and fc-list runs meanwhile.
+    with ThreadPoolExecutor(max_workers=len(fontpaths) + 1) as executor:
+        installed_fonts = (executor.submit(list_installed_fonts)
+                           if list_installed_fonts is not None else None)
+        listings = [executor.submit(list_fonts, path, fontexts)
+                    for path in fontpaths]
+        for listing in listings:
+            fontfiles.update(map(os.path.abspath, listing.result()))
+        if installed_fonts is not None:
+            # Only the fonts which the walk didn't find need to be checked.
+            fontfiles.update(
+                fname for fname in map(str, installed_fonts.result())
+                if fname.lower().endswith(suffixes)
+                and fname not in fontfiles and os.path.exists(fname))
 
-    for path in fontpaths:
-        fontfiles.update(map(os.path.abspath, list_fonts(path, fontexts)))
-
-    return [fname for fname in fontfiles if os.path.exists(fname)]
+    return list(fontfiles)
@@ -0,0 +1,253 @@
+"""Print one label per record of a CSV or JSONL file.
+
+Each record is mapped onto the command line options, so that a record behaves like
+a separate invocation of dymoprint with the same options. The recognized fields are:
+
+- ``text``, ``text1``, ``text2``, ...: the text lines (in JSONL, ``text`` may also
+  be a list of lines)
+- ``qr``: content of a QR code, like ``-qr``
+- ``barcode``: content of a barcode, like ``--barcode``
+- ``barcode_text``: content of a barcode with text below it, like ``--barcode-text``
+- ``barcode_type``: type of the barcode, defaults to the type given on the command
+  line
+- ``picture``: like ``--picture``
+- ``min_length``, ``max_length``, ``fixed_length``: like the length options, in mm
+
+Empty fields are ignored. Records with nothing to print fail.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import re
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator
+
+import usb
+from PIL import Image
+
+from dymoprint.cli.cli import label_spec_from_args
+from dymoprint.lib.batch_render import RenderResult, render_batch
+from dymoprint.lib.config_file import get_config_file
+from dymoprint.lib.detect import detect_device
+from dymoprint.lib.dymo_print_engines import print_label_raster
+from dymoprint.lib.label_spec import LabelSpec
+from dymoprint.lib.unicode_blocks import print_image_as_unicode
+from dymoprint.lib.utils import die
+
+Record = Dict[str, Any]
+
+_TEXT_FIELD = re.compile(r"^text(\d*)$")
+_CODE_FIELDS = ("qr", "barcode", "barcode_text")
+_LENGTH_FIELDS = ("min_length", "max_length", "fixed_length")
+_OTHER_FIELDS = ("barcode_type", "picture")
+
+
+def _read_csv(lines: Iterable[str]) -> Iterator[Record | Exception]:
+    yield from csv.DictReader(lines)
+
+
+def _read_jsonl(lines: Iterable[str]) -> Iterator[Record | Exception]:
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+            continue
+        if isinstance(record, dict):
+            yield record
+        else:
+            yield ValueError("A JSONL record must be an object")
+
+
+def _guess_format(path: str, first_line: str) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if suffix == ".csv":
+        return "csv"
+    return "jsonl" if first_line.lstrip().startswith("{") else "csv"
+
+
+def read_records(
+    path: str, batch_format: str | None = None
+) -> Iterator[Record | Exception]:
+    """Lazily read the records of a CSV or JSONL file, or of stdin for '-'.
+
+    Records which can't be parsed are yielded as exceptions, so that the remaining
+    records can still be processed.
+    """
+    f = sys.stdin if path == "-" else Path(path).open(newline="")
+    try:
+        first_line = f.readline()
+        if batch_format is None:
+            batch_format = _guess_format(path, first_line)
+        lines = _prepend(first_line, f)
+        if batch_format == "jsonl":
+            yield from _read_jsonl(lines)
+        else:
+            yield from _read_csv(lines)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _prepend(first_line: str, f: Iterable[str]) -> Iterator[str]:
+    if first_line:
+        yield first_line
+    yield from f
+
+
+def _text_lines(record: Record) -> list[str]:
+    numbered_lines = []
+    for key, value in record.items():
+        match = _TEXT_FIELD.match(key)
+        if match is None or value in (None, ""):
+            continue
+        lines = value if isinstance(value, list) else [value]
+        numbered_lines.append((int(match.group(1) or 0), [str(v) for v in lines]))
+    return [line for _, lines in sorted(numbered_lines) for line in lines]
+
+
+def record_to_args(record: Record, args: argparse.Namespace) -> argparse.Namespace:
+    """Override the command line options with the fields of a record."""
+    if None in record:
+        raise ValueError("Record has more values than there are columns")
+    record = {k: v for k, v in record.items() if v not in (None, "")}
+    known_fields = (*_CODE_FIELDS, *_LENGTH_FIELDS, *_OTHER_FIELDS)
+    unknown_fields = [
+        k for k in record if k not in known_fields and not _TEXT_FIELD.match(k)
+    ]
+    if unknown_fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown_fields)}")
+
+    overrides: dict[str, Any] = {"text": _text_lines(record)}
+    code_fields = [k for k in _CODE_FIELDS if k in record]
+    if len(code_fields) > 1:
+        raise ValueError(f"Conflicting fields: {', '.join(code_fields)}")
+    if code_fields:
+        code_field = code_fields[0]
+        overrides.update(qr=False, barcode=False, barcode_text=False)
+        if code_field == "qr":
+            overrides["qr"] = True
+        else:
+            barcode_type = (
+                record.get("barcode_type") or args.barcode or args.barcode_text
+            )
+            if not barcode_type:
+                raise ValueError("No barcode type given")
+            overrides[code_field] = barcode_type
+        overrides["text"].insert(0, str(record[code_field]))
+    if not (overrides["text"] or code_fields or record.get("picture") or args.picture):
+        raise ValueError("Record has nothing to print")
+    for field in _LENGTH_FIELDS:
+        if field in record:
+            overrides[field] = int(record[field])
+    if "fixed_length" in record:
+        overrides.update(min_length=0, max_length=None)
+    if "picture" in record:
+        overrides["picture"] = str(record["picture"])
+    return argparse.Namespace(**{**vars(args), **overrides})
+
+
+def _record_to_spec(
+    record: Record | Exception, args: argparse.Namespace, font_filename: str
+) -> LabelSpec:
+    if isinstance(record, Exception):
+        raise record
+    return label_spec_from_args(record_to_args(record, args), font_filename)
+
+
+def render_records(
+    args: argparse.Namespace, font_filename: str
+) -> Iterator[tuple[int, RenderResult]]:
+    """Render the records of the batch file, yielding (record number, result).
+
+    Records which fail, either while being parsed or while being rendered, yield
+    their exception as the result.
+    """
+    # Record numbers and parse failures, in the order in which specs were consumed
+    consumed: deque[tuple[int, Exception | None]] = deque()
+
+    def specs() -> Iterator[LabelSpec]:
+        for record_number, record in enumerate(
+            read_records(args.batch, args.batch_format), start=1
+        ):
+            try:
+                spec = _record_to_spec(record, args, font_filename)
+            except (ValueError, KeyError, TypeError) as e:
+                consumed.append((record_number, e))
+                continue
+            consumed.append((record_number, None))
+            yield spec
+
+    results = render_batch(
+        specs(),
+        tape_size_mm=args.t,
+        text_backend=args.text_backend,
+        max_workers=(
+            args.workers if args.workers is not None else get_config_file().workers
+        ),
+        warm_fonts=[font_filename],
+        warm_barcodes=[
+            bar_code_type
+            for bar_code_type in (args.barcode, args.barcode_text)
+            if bar_code_type
+        ],
+        return_exceptions=True,
+    )
+    for result in results:
+        yield from _pop_parse_failures(consumed)
+        record_number, _ = consumed.popleft()
+        yield record_number, result
+    yield from _pop_parse_failures(consumed)
+
+
+def _pop_parse_failures(
+    consumed: deque[tuple[int, Exception | None]],
+) -> Iterator[tuple[int, RenderResult]]:
+    while consumed and (error := consumed[0][1]) is not None:
+        yield consumed.popleft()[0], error
+
+
+def run_batch(args: argparse.Namespace, font_filename: str) -> None:
+    """Render and print (or preview) every record of the batch file."""
+    if args.imagemagick or args.browser:
+        die("Error: batch mode only supports the unicode preview")
+    preview = args.preview or args.preview_inverted or args.preview_braille
+    detected_device = None if preview else detect_device()
+
+    num_printed = 0
+    num_failed = 0
+    try:
+        for record_number, result in render_records(args, font_filename):
+            if isinstance(result, Exception):
+                num_failed += 1
+                print(f"Record {record_number} failed: {result}", file=sys.stderr)
+                continue
+            if detected_device is None:
+                print(f"Record {record_number}:")
+                label_rotated = result.to_image().transpose(Image.ROTATE_270)
+                print_image_as_unicode(
+                    label_rotated,
+                    invert=args.preview_inverted,
+                    braille=args.preview_braille,
+                )
+            else:
+                print_label_raster(
+                    detected_device, result, margin_px=args.m, tape_size_mm=args.t
+                )
+            num_printed += 1
+    finally:
+        if detected_device is not None:
+            usb.util.dispose_resources(detected_device.dev)
+
+    print(f"{num_printed} labels done, {num_failed} failed.")
+    if num_failed:
+        sys.exit(1)
@@ -6,25 +6,30 @@
 # this notice are preserved.
 # === END LICENSE STATEMENT ===
 
+from __future__ import annotations
+
 import argparse
 import sys
-import webbrowser
-from tempfile import NamedTemporaryFile
 
 from PIL import Image, ImageOps
 
 from dymoprint import __version__
+from dymoprint.lib.config_file import get_config_file
 from dymoprint.lib.constants import (
     AVAILABLE_BARCODES,
     DEFAULT_MARGIN_PX,
     PIXELS_PER_MM,
-    USE_QR,
-    e_qrcode,
 )
-from dymoprint.lib.detect import detect_device
-from dymoprint.lib.dymo_print_engines import DymoRenderEngine, print_label
+from dymoprint.lib.dymo_print_engines import (
+    TEXT_BACKENDS,
+    DymoRenderEngine,
+    RenderError,
+    print_label,
+)
 from dymoprint.lib.font_config import FontConfig, FontStyle, NoFontFound
-from dymoprint.lib.unicode_blocks import image_to_unicode
+from dymoprint.lib.label_spec import LabelSpec, render_label_spec
+from dymoprint.lib.profiling import Profile, profile_stage
+from dymoprint.lib.unicode_blocks import print_image_as_unicode
 from dymoprint.lib.utils import die
 from dymoprint.metadata import our_metadata
 
@@ -38,13 +43,19 @@ FLAG_TO_STYLE = {
 
 def parse_args():
     # check for any text specified on the command line
-    parser = argparse.ArgumentParser(description=our_metadata["Summary"])
+    parser = argparse.ArgumentParser(
+        description=our_metadata["Summary"],
+        epilog=(
+            "Run 'dymoprint stats' to summarize the telemetry log of print jobs. "
+            "To print the text 'stats', use 'dymoprint -- stats'."
+        ),
+    )
     parser.add_argument(
         "--version", action="version", version=f"%(prog)s {__version__}"
     )
     parser.add_argument(
         "text",
-        nargs="+",
+        nargs="*",
         help="Text Parameter, each parameter gives a new line",
         type=str,
     )
@@ -112,8 +123,30 @@ def parse_args():
             "minimum or fixed length (left, center, right)"
         ),
     )
+    length_options.add_argument(
+        "--auto-fit",
+        action="store_const",
+        const="size",
+        help=(
+            "Shrink the font so that the text fits the maximum or fixed length, "
+            "using --scale as the largest font size"
+        ),
+    )
+    length_options.add_argument(
+        "--auto-wrap",
+        dest="auto_fit",
+        action="store_const",
+        const="wrap",
+        help="Like --auto-fit, but also rewrap the text into fewer or more lines",
+    )
     parser.add_argument(
-        "-u", "--font", nargs="?", help='Set user font, overrides "-s" parameter'
+        "-u",
+        "--font",
+        nargs="?",
+        help=(
+            "Set user font by file, file name or full name, overrides the "
+            '"-s" parameter. With a font family name, "-s" selects the style'
+        ),
     )
     parser.add_argument(
         "-n",
@@ -126,6 +159,14 @@ def parse_args():
         action="store_true",
         help="Unicode preview of label, colors inverted, do not send to printer",
     )
+    parser.add_argument(
+        "--preview-braille",
+        action="store_true",
+        help=(
+            "Unicode preview of label with braille patterns, 4 times denser, "
+            "do not send to printer"
+        ),
+    )
     parser.add_argument(
         "--imagemagick",
         action="store_true",
@@ -169,7 +210,68 @@ def parse_args():
         default=12,
         help="Tape size: 6,9,12,19 mm, default=12mm",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--text-backend",
+        choices=TEXT_BACKENDS,
+        default="freetype",
+        help=(
+            "Render text with FreeType, or by pasting cached glyphs (atlas), "
+            "which is faster when printing many labels"
+        ),
+    )
+
+    batch_options = parser.add_argument_group("Batch options")
+    batch_options.add_argument(
+        "--batch",
+        metavar="FILE",
+        help=(
+            "Print one label per record of a CSV or JSONL file ('-' for stdin). "
+            "Record fields override the corresponding options"
+        ),
+    )
+    batch_options.add_argument(
+        "--batch-format",
+        choices=["csv", "jsonl"],
+        default=None,
+        help="Format of the batch file (default: guessed from the file)",
+    )
+    batch_options.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=(
+            "Number of processes rendering batch labels "
+            "(default: from dymoprint.ini, or the number of CPUs)"
+        ),
+    )
+
+    profiling_options = parser.add_argument_group("Profiling options")
+    profiling_options.add_argument(
+        "--profile",
+        action="store_const",
+        const="table",
+        help=(
+            "Print the time spent in each stage, and the traffic with the printer, "
+            "to stderr"
+        ),
+    )
+    profiling_options.add_argument(
+        "--profile-json",
+        dest="profile",
+        action="store_const",
+        const="json",
+        help="Like --profile, formatted as JSON",
+    )
+    profiling_options.add_argument(
+        "--cprofile",
+        metavar="FILE",
+        help="Save cProfile statistics of the run to FILE, e.g. for python -m pstats",
+    )
+
+    args = parser.parse_args()
+    if args.batch is None and not args.text:
+        parser.error("the following arguments are required: text")
+    return args
 
 
 def mm_to_payload_px(mm, margin):
@@ -177,78 +279,42 @@ def mm_to_payload_px(mm, margin):
 
     The print resolution is 7 pixels/mm, and margin is subtracted from each side.
     """
-    return (mm * PIXELS_PER_MM) - margin * 2
-
+    return int(mm * PIXELS_PER_MM) - margin * 2
 
-def main():
-    args = parse_args()
-    render_engine = DymoRenderEngine(args.t)
-
-    # read config file
-    style = FLAG_TO_STYLE.get(args.style)
-    try:
-        font_config = FontConfig(font=args.font, style=style)
-    except NoFontFound as e:
-        valid_font_names = [f.stem for f in FontConfig.available_fonts()]
-        print(
-            f"Valid fonts are: {', '.join(valid_font_names)}.",
-            file=sys.stderr,
-        )
-        raise e
 
-    font_filename = font_config.path
+def label_spec_from_args(args, font_filename) -> LabelSpec:
+    """Describe the label which is specified by the command line options.
 
-    labeltext = args.text
+    Raises ValueError if the options are inconsistent.
+    """
+    labeltext = list(args.text)
 
     # check if barcode, qrcode or text should be printed, use frames only on text
-    if args.qr and not USE_QR:
-        die(f"Error: {e_qrcode}")
+    if args.qr:
+        from dymoprint.lib.constants import USE_QR, e_qrcode
+
+        if not USE_QR:
+            raise ValueError(f"Error: {e_qrcode}")
 
     if args.barcode and args.qr:
-        die("Error: can not print both QR and Barcode on the same label (yet)")
+        raise ValueError(
+            "Error: can not print both QR and Barcode on the same label (yet)"
+        )
 
     if args.fixed_length is not None and (
         args.min_length != 0 or args.max_length is not None
     ):
-        die("Error: can't specify min/max and fixed length at the same time")
-
-    if args.max_length is not None and args.max_length < args.min_length:
-        die("Error: maximum length is less than minimum length")
-
-    bitmaps = []
-
-    if args.test_pattern:
-        bitmaps.append(render_engine.render_test(args.test_pattern))
-
-    if args.qr:
-        bitmaps.append(render_engine.render_qr(labeltext.pop(0)))
-
-    elif args.barcode:
-        bitmaps.append(render_engine.render_barcode(labeltext.pop(0), args.barcode))
-
-    elif args.barcode_text:
-        bitmaps.append(
-            render_engine.render_barcode_with_text(
-                labeltext.pop(0), args.barcode_text, font_filename, args.f
-            )
+        raise ValueError(
+            "Error: can't specify min/max and fixed length at the same time"
         )
 
-    if labeltext:
-        bitmaps.append(
-            render_engine.render_text(
-                text_lines=labeltext,
-                font_file_name=font_filename,
-                frame_width_px=args.f,
-                font_size_ratio=int(args.scale) / 100.0,
-                align=args.a,
-            )
-        )
+    if args.max_length is not None and args.max_length < args.min_length:
+        raise ValueError("Error: maximum length is less than minimum length")
 
-    if args.picture:
-        bitmaps.append(render_engine.render_picture(args.picture))
+    if args.auto_fit and args.max_length is None and args.fixed_length is None:
+        raise ValueError("Error: auto-fit requires a maximum or fixed length")
 
     margin = args.m
-    justify = args.j
 
     if args.fixed_length is not None:
         min_label_mm_len = args.fixed_length
@@ -264,33 +330,142 @@ def main():
         else None
     )
 
-    label_bitmap = render_engine.merge_render(
-        bitmaps=bitmaps,
+    code_text = None
+    if args.qr or args.barcode or args.barcode_text:
+        if not labeltext:
+            raise ValueError("Error: no text given for the QR code or barcode")
+        code_text = labeltext.pop(0)
+
+    return LabelSpec(
+        text_lines=labeltext,
+        font_file_name=font_filename,
+        frame_width_px=args.f,
+        font_size_ratio=int(args.scale) / 100.0,
+        align=args.a,
+        qr=code_text if args.qr else None,
+        barcode=None if args.qr else code_text,
+        barcode_type=args.barcode or args.barcode_text or None,
+        barcode_with_text=bool(args.barcode_text) and not args.barcode,
+        picture=args.picture,
+        test_pattern=args.test_pattern,
         min_payload_len_px=min_payload_len_px,
         max_payload_len_px=max_payload_len_px,
-        justify=justify,
+        justify=args.j,
+        auto_fit=args.auto_fit,
     )
 
+
+def main():
+    if sys.argv[1:2] == ["stats"]:
+        from dymoprint.cli.stats import main as stats_main
+
+        stats_main(sys.argv[2:])
+        return
+
+    args = parse_args()
+    # The telemetry log takes the render time from the profile
+    if args.profile or get_config_file().telemetry_log is not None:
+        profile = Profile()
+    else:
+        profile = None
+    profiler = None
+    if args.cprofile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run(args, profile)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+        if args.profile:
+            assert profile is not None
+            report = (
+                profile.format_json()
+                if args.profile == "json"
+                else profile.format_table()
+            )
+            print(report, file=sys.stderr)
+
+
+def run(args, profile: Profile | None = None):
+    """Print or preview the label which the parsed arguments describe."""
+    # read config file
+    style = FLAG_TO_STYLE.get(args.style)
+    with profile_stage(profile, "fonts"):
+        try:
+            font_config = FontConfig(font=args.font, style=style)
+        except NoFontFound as e:
+            valid_font_names = [f.stem for f in FontConfig.available_fonts()]
+            print(
+                f"Valid fonts are: {', '.join(valid_font_names)}.",
+                file=sys.stderr,
+            )
+            raise e
+
+    font_filename = font_config.path
+
+    if args.batch is not None:
+        from dymoprint.cli.batch import run_batch
+
+        with profile_stage(profile, "batch"):
+            run_batch(args, font_filename)
+        return
+
+    render_engine = DymoRenderEngine(args.t, text_backend=args.text_backend)
+    try:
+        spec = label_spec_from_args(args, font_filename)
+    except ValueError as e:
+        die(str(e))
+    try:
+        label_bitmap = render_label_spec(render_engine, spec, profile)
+    except RenderError as e:
+        die(str(e))
+    margin = args.m
+
     # print or show the label
-    if args.preview or args.preview_inverted or args.imagemagick or args.browser:
+    if (
+        args.preview
+        or args.preview_inverted
+        or args.preview_braille
+        or args.imagemagick
+        or args.browser
+    ):
         print("Demo mode: showing label..")
         # fix size, adding print borders
         label_image = Image.new(
             "1", (margin + label_bitmap.width + margin, label_bitmap.height)
         )
         label_image.paste(label_bitmap, (margin, 0))
-        if args.preview or args.preview_inverted:
-            label_rotated = label_bitmap.transpose(Image.ROTATE_270)
-            print(image_to_unicode(label_rotated, invert=args.preview_inverted))
+        if args.preview or args.preview_inverted or args.preview_braille:
+            with profile_stage(profile, "preview"):
+                label_rotated = label_bitmap.transpose(Image.ROTATE_270)
+                print_image_as_unicode(
+                    label_rotated,
+                    invert=args.preview_inverted,
+                    braille=args.preview_braille,
+                )
         if args.imagemagick:
             ImageOps.invert(label_image).show()
         if args.browser:
+            import webbrowser
+            from tempfile import NamedTemporaryFile
+
             with NamedTemporaryFile(suffix=".png", delete=False) as fp:
                 ImageOps.invert(label_image).save(fp)
                 webbrowser.open(f"file://{fp.name}")
 
     else:
-        detected_device = detect_device()
+        from dymoprint.lib.detect import detect_device
+
+        with profile_stage(profile, "detect"):
+            detected_device = detect_device()
         print_label(
-            detected_device, label_bitmap, margin_px=args.m, tape_size_mm=args.t
+            detected_device,
+            label_bitmap,
+            margin_px=args.m,
+            tape_size_mm=args.t,
+            profile=profile,
         )
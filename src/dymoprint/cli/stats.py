@@ -0,0 +1,103 @@
+"""The `dymoprint stats` command, which summarizes the telemetry log of print jobs."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Sequence
+
+from dymoprint.lib.config_file import get_config_file
+from dymoprint.lib.telemetry import (
+    DeviceStats,
+    default_telemetry_log_path,
+    iter_records,
+    summarize,
+)
+from dymoprint.lib.utils import die
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="dymoprint stats",
+        description=(
+            "Summarize the print jobs in the telemetry log, which is written when "
+            "telemetry is enabled in the [TELEMETRY] section of dymoprint.ini"
+        ),
+    )
+    parser.add_argument(
+        "--log",
+        metavar="FILE",
+        type=Path,
+        help="Telemetry log to read ('-' for stdin, default: from dymoprint.ini)",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the summary as JSON lines"
+    )
+    return parser.parse_args(argv)
+
+
+def _format_number(value: float | None, scale: float = 1, digits: int = 0) -> str:
+    return "-" if value is None else f"{value * scale:.{digits}f}"
+
+
+def format_table(stats: list[DeviceStats]) -> str:
+    header = (
+        "printer",
+        "jobs",
+        "errors",
+        "p50 ms",
+        "p95 ms",
+        "lines/s",
+        "kB/s",
+        "label m",
+    )
+    rows = [header]
+    rows.extend(
+        (
+            s.device,
+            str(s.jobs),
+            str(s.errors),
+            _format_number(s.latency_p50_s, 1000),
+            _format_number(s.latency_p95_s, 1000),
+            _format_number(s.lines_per_s),
+            _format_number(s.bytes_per_s, 1 / 1000, 1),
+            _format_number(s.label_mm, 1 / 1000, 2),
+        )
+        for s in stats
+    )
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(
+            cell.ljust(width) if i == 0 else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        )
+        for row in rows
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if str(args.log) == "-":
+        stats = summarize(iter_records(sys.stdin))
+    else:
+        path = (
+            args.log or get_config_file().telemetry_log or default_telemetry_log_path()
+        )
+        try:
+            with path.open() as f:
+                stats = summarize(iter_records(f))
+        except FileNotFoundError:
+            die(
+                f"Error: no telemetry log at {path}, enable telemetry in "
+                "the [TELEMETRY] section of dymoprint.ini"
+            )
+
+    if args.json:
+        for s in stats:
+            print(json.dumps(s._asdict()))
+    elif not stats:
+        print("No print jobs logged yet.")
+    else:
+        print(format_table(stats))
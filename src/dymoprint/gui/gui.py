@@ -2,10 +2,10 @@ import sys
 import traceback
 from typing import Optional
 
-from PIL import Image, ImageOps, ImageQt
+from PIL import Image
 from PyQt6 import QtCore
-from PyQt6.QtCore import QSize, Qt, QTimer
-from PyQt6.QtGui import QColor, QIcon, QPainter, QPixmap
+from PyQt6.QtCore import QSize, QSocketNotifier, Qt, QTimer
+from PyQt6.QtGui import QColor, QIcon, QImage, QPainter, QPixmap
 from PyQt6.QtWidgets import (
     QApplication,
     QComboBox,
@@ -19,11 +19,13 @@ from PyQt6.QtWidgets import (
     QVBoxLayout,
     QWidget,
 )
-from usb.core import NoBackendError, USBError
+from usb.core import USBError
 
+from dymoprint.lib.config_file import get_config_file
 from dymoprint.lib.constants import DEFAULT_MARGIN_PX, ICON_DIR
-from dymoprint.lib.detect import DeviceDetectionError, detect_device
+from dymoprint.lib.device_monitor import DeviceMonitor
 from dymoprint.lib.dymo_print_engines import DymoRenderEngine, print_label
+from dymoprint.lib.render_cache import RenderCache
 
 from .q_dymo_labels_list import QDymoLabelList
 
@@ -33,7 +35,8 @@ class DymoPrintWindow(QWidget):
 
     def __init__(self):
         super().__init__()
-        self.render_engine = DymoRenderEngine(12)
+        self.render_cache = RenderCache(get_config_file().render_cache_bytes)
+        self.render_engine = DymoRenderEngine(12, render_cache=self.render_cache)
         self.label_bitmap = None
         self.detected_device = None
 
@@ -91,9 +94,17 @@ class DymoPrintWindow(QWidget):
 
     def init_timers(self):
         self.detected_device = None
-        self.check_status()
+        self.device_monitor = DeviceMonitor(on_change=self.update_device_status)
+        self.device_monitor.refresh()
+        fd = self.device_monitor.fileno()
+        if fd is not None:
+            # Detect the device again as soon as udev reports a change
+            self.device_notifier = QSocketNotifier(fd, QSocketNotifier.Type.Read, self)
+            self.device_notifier.activated.connect(self.device_monitor.poll)
+        # Without udev, this notices changes. With udev, it only retries failed
+        # detections.
         self.status_time = QTimer()
-        self.status_time.timeout.connect(self.check_status)
+        self.status_time.timeout.connect(self.device_monitor.poll)
         self.status_time.setInterval(2000)
         self.status_time.start(2000)
 
@@ -102,8 +113,8 @@ class DymoPrintWindow(QWidget):
         self.tape_size.currentTextChanged.connect(self.update_params)
         self.min_label_len.valueChanged.connect(self.update_params)
         self.justify.currentTextChanged.connect(self.update_params)
-        self.foreground_color.currentTextChanged.connect(self.label_list.render_label)
-        self.background_color.currentTextChanged.connect(self.label_list.render_label)
+        self.foreground_color.currentTextChanged.connect(self.redraw_label_render)
+        self.background_color.currentTextChanged.connect(self.redraw_label_render)
         self.label_list.renderSignal.connect(self.update_label_render)
         self.print_button.clicked.connect(self.print_label)
 
@@ -141,7 +152,9 @@ class DymoPrintWindow(QWidget):
         self.setLayout(self.window_layout)
 
     def update_params(self):
-        self.render_engine = DymoRenderEngine(self.tape_size.currentData())
+        self.render_engine = DymoRenderEngine(
+            self.tape_size.currentData(), render_cache=self.render_cache
+        )
         justify = self.justify.currentText()
         min_label_mm_len: int = self.min_label_len.value()
         min_payload_len_px = max(0, (min_label_mm_len * 7) - self.margin.value() * 2)
@@ -149,30 +162,36 @@ class DymoPrintWindow(QWidget):
 
     def update_label_render(self, label_bitmap):
         self.label_bitmap = label_bitmap
-        label_image = Image.new(
-            "L",
-            (
-                self.margin.value() + label_bitmap.width + self.margin.value(),
-                label_bitmap.height,
-            ),
+        margin = self.margin.value()
+        background = QColor(self.background_color.currentText())
+        foreground = QColor(self.foreground_color.currentText())
+
+        # The packed rows of the bitmap are shown as they are, with the burned
+        # pixels in the foreground color
+        data = label_bitmap.tobytes()
+        label_image = QImage(
+            data,
+            label_bitmap.width,
+            label_bitmap.height,
+            (label_bitmap.width + 7) // 8,
+            QImage.Format.Format_Mono,
         )
-        label_image.paste(label_bitmap, (self.margin.value(), 0))
-        label_image_inv = ImageOps.invert(label_image).copy()
-        qim = ImageQt.ImageQt(label_image_inv)
-        q_image = QPixmap.fromImage(qim)
+        label_image.setColorTable([background.rgb(), foreground.rgb()])
 
-        mask = q_image.createMaskFromColor(
-            QColor("255, 255, 255"), Qt.MaskMode.MaskOutColor
-        )
-        q_image.fill(QColor(self.background_color.currentText()))
+        q_image = QPixmap(margin + label_bitmap.width + margin, label_bitmap.height)
+        q_image.fill(background)
         p = QPainter(q_image)
-        p.setPen(QColor(self.foreground_color.currentText()))
-        p.drawPixmap(q_image.rect(), mask, mask.rect())
+        p.drawImage(margin, 0, label_image)
         p.end()
 
         self.label_render.setPixmap(q_image)
         self.label_render.adjustSize()
 
+    def redraw_label_render(self):
+        """Draw the rendered label again, e.g. in other colors."""
+        if self.label_bitmap is not None:
+            self.update_label_render(self.label_bitmap)
+
     def print_label(self):
         try:
             if self.label_bitmap is None:
@@ -189,14 +208,11 @@ class DymoPrintWindow(QWidget):
                 self, "Printing Failed!", f"{err}\n\n{traceback.format_exc()}"
             )
 
-    def check_status(self):
-        is_enabled = False
-        try:
-            self.detected_device = detect_device()
-            is_enabled = True
-        except (DeviceDetectionError, NoBackendError, USBError) as e:
-            self.error_label.setText(f"Error: {e}")
-            self.detected_device = None
+    def update_device_status(self, detected_device, error):
+        self.detected_device = detected_device
+        is_enabled = detected_device is not None
+        if error is not None:
+            self.error_label.setText(f"Error: {error}")
         self.error_label.setVisible(not is_enabled)
         self.print_button.setVisible(is_enabled)
         self.print_button.setEnabled(is_enabled)
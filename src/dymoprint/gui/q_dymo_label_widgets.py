@@ -1,7 +1,8 @@
-import traceback
+import functools
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
+from PIL import Image
 from PyQt6 import QtCore
 from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import (
@@ -11,7 +12,6 @@ from PyQt6.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QLineEdit,
-    QMessageBox,
     QPlainTextEdit,
     QPushButton,
     QSpinBox,
@@ -20,18 +20,24 @@ from PyQt6.QtWidgets import (
 
 from dymoprint.lib.constants import AVAILABLE_BARCODES, ICON_DIR
 from dymoprint.lib.dymo_print_engines import DymoRenderEngine
-from dymoprint.lib.font_config import FontConfig
+from dymoprint.lib.font_config import default_font_path
+from dymoprint.lib.font_index import get_font_index
+from dymoprint.lib.render_cache import file_stamp
 
 
 class FontStyle(QComboBox):
     def __init__(self):
         super().__init__()
-        # Populate font_style
-        for font_path in FontConfig.available_fonts():
-            name = font_path.stem
-            absolute_path = font_path.absolute()
-            self.addItem(name, absolute_path)
-            self.setCurrentText("Carlito-Regular")
+        # Populate font_style from the font index, which is shared with the CLI
+        for entry in get_font_index().entries:
+            self.addItem(entry.path.stem, entry.path.absolute())
+            self.setItemData(
+                self.count() - 1, entry.full_name, QtCore.Qt.ItemDataRole.ToolTipRole
+            )
+        default_path = Path(default_font_path()).absolute()
+        for i in range(self.count()):
+            if self.itemData(i) == default_path:
+                self.setCurrentIndex(i)
 
 
 class BaseDymoLabelWidget(QWidget):
@@ -42,35 +48,84 @@ class BaseDymoLabelWidget(QWidget):
     itemRenderSignal : PyQtSignal
         Signal emitted when the content of the label is changed.
 
+    The last rendered bitmap is cached, until the content of the label changes, the
+    tape size of the render engine changes, or the stamp of its source changes.
+
     Methods
     -------
     content_changed()
         Emits the itemRenderSignal when the content of the label is changed.
-    render_label()
-        Abstract method to be implemented by subclasses for rendering the label.
+    render_job()
+        Abstract method to be implemented by subclasses, which returns a function
+        rendering the label.
     """
 
-    render_engine: DymoRenderEngine
+    _render_engine: Optional[DymoRenderEngine] = None
+    _cached_bitmap: Optional[Image.Image] = None
+    _cached_source_stamp: object = None
+    render_version = 0
+    """Incremented when the cached bitmap becomes outdated."""
 
     itemRenderSignal = QtCore.pyqtSignal(name="itemRenderSignal")
 
+    @property
+    def render_engine(self) -> DymoRenderEngine:
+        assert self._render_engine is not None
+        return self._render_engine
+
+    @render_engine.setter
+    def render_engine(self, render_engine: DymoRenderEngine):
+        if (
+            self._render_engine is None
+            or self._render_engine.label_height_px != render_engine.label_height_px
+        ):
+            self.invalidate()
+        self._render_engine = render_engine
+
+    @property
+    def cached_bitmap(self) -> Optional[Image.Image]:
+        """The last rendered bitmap, or None if it's outdated."""
+        if (
+            self._cached_bitmap is not None
+            and self._cached_source_stamp != self.source_stamp()
+        ):
+            self.invalidate()
+        return self._cached_bitmap
+
+    def invalidate(self):
+        """Drop the cached bitmap, since it doesn't match the settings anymore."""
+        self._cached_bitmap = None
+        self.render_version += 1
+
+    def cache_bitmap(self, render_version: int, source_stamp, bitmap: Image.Image):
+        """Cache a bitmap if it was rendered from the current settings.
+
+        source_stamp is the stamp of the source when the bitmap was rendered.
+        """
+        if render_version == self.render_version:
+            self._cached_bitmap = bitmap
+            self._cached_source_stamp = source_stamp
+
+    def source_stamp(self):
+        """Return a stamp which changes when the source of the label changes.
+
+        The source is what the label is rendered from besides the settings, for
+        example a file. To be implemented by subclasses which have one.
+        """
+        return None
+
     def content_changed(self):
         """Emit the itemRenderSignal when the content of the label is changed."""
+        self.invalidate()
         self.itemRenderSignal.emit()
 
-    def render_label_impl(self):
-        """Abstract method to be implemented by subclasses for rendering the label."""
-        pass
-
-    def render_label(self):
-        try:
-            return self.render_label_impl()
-        except BaseException as err:  # noqa: BLE001
-            traceback.print_exc()
-            QMessageBox.warning(
-                self, "Render fail!", f"{err}\n\n\n{traceback.format_exc()}"
-            )
-            return self.render_engine.render_empty()
+    def render_job(self) -> Callable[[], Image.Image]:
+        """Return a function which renders the label with the current settings.
+
+        The settings are read from the widgets now, so that the function can run
+        in a render thread. To be implemented by subclasses.
+        """
+        return self.render_engine.render_empty
 
 
 class TextDymoLabelWidget(BaseDymoLabelWidget):
@@ -147,22 +202,19 @@ class TextDymoLabelWidget(BaseDymoLabelWidget):
         """
         self.label.setFixedHeight(15 * (len(self.label.toPlainText().splitlines()) + 2))
         self.setFixedHeight(self.label.height() + 10)
-        self.itemRenderSignal.emit()
+        super().content_changed()
 
-    def render_label_impl(self):
-        """Render the label using the current settings.
+    def render_job(self):
+        """Return a function which renders the text with the current settings.
 
         Returns
         -------
-            QImage: The rendered label image.
-
-        Raises
-        ------
-            QMessageBox.warning: If the rendering fails.
+            Callable[[], Image.Image]: Renders the label image.
         """
         selected_alignment = self.align.currentText()
         assert selected_alignment in ("left", "center", "right")
-        return self.render_engine.render_text(
+        return functools.partial(
+            self.render_engine.render_text,
             text_lines=self.label.toPlainText().splitlines(),
             font_file_name=self.font_style.currentData(),
             frame_width_px=self.frame_width.value(),
@@ -203,18 +255,14 @@ class QrDymoLabelWidget(BaseDymoLabelWidget):
         self.label.textChanged.connect(self.content_changed)
         self.setLayout(layout)
 
-    def render_label_impl(self):
-        """Render the QR code on the Dymo label.
+    def render_job(self):
+        """Return a function which renders the QR code on the Dymo label.
 
         Returns
         -------
-            bytes: The rendered QR code as bytes.
-
-        Raises
-        ------
-            QMessageBox.warning: If the rendering fails.
+            Callable[[], Image.Image]: Renders the QR code.
         """
-        return self.render_engine.render_qr(self.label.text())
+        return functools.partial(self.render_engine.render_qr, self.label.text())
 
 
 class BarcodeDymoLabelWidget(BaseDymoLabelWidget):
@@ -242,8 +290,8 @@ class BarcodeDymoLabelWidget(BaseDymoLabelWidget):
     Methods:
     -------
         __init__(self, render_engine, parent=None): Initializes the widget.
-        render_label(self): Renders the barcode label using the current content
-            and barcode type.
+        render_job(self): Returns a function which renders the barcode label using
+            the current content and barcode type.
     """
 
     label: QLineEdit
@@ -349,19 +397,16 @@ class BarcodeDymoLabelWidget(BaseDymoLabelWidget):
         self.set_text_fields_visibility(is_checked)
         self.content_changed()  # Trigger rerender
 
-    def render_label_impl(self):
-        """Render the labels with barcode and text below it using the current settings.
+    def render_job(self):
+        """Return a function which renders the barcode, and the text below it.
 
         Returns
         -------
-            QImage: The rendered label image.
-
-        Raises
-        ------
-            QMessageBox.warning: If the rendering fails.
+            Callable[[], Image.Image]: Renders the label image.
         """
         if self.show_text_checkbox.isChecked():
-            return self.render_engine.render_barcode_with_text(
+            return functools.partial(
+                self.render_engine.render_barcode_with_text,
                 barcode_input_text=self.label.text(),
                 bar_code_type=self.barcode_type.currentText(),
                 font_file_name=self.font_style.currentData(),
@@ -369,8 +414,10 @@ class BarcodeDymoLabelWidget(BaseDymoLabelWidget):
                 font_size_ratio=self.font_size.value() / 100.0,
                 align=self.align.currentText(),
             )
-        return self.render_engine.render_barcode(
-            self.label.text(), self.barcode_type.currentText()
+        return functools.partial(
+            self.render_engine.render_barcode,
+            self.label.text(),
+            self.barcode_type.currentText(),
         )
 
 
@@ -416,11 +463,15 @@ class ImageDymoLabelWidget(BaseDymoLabelWidget):
         self.label.textChanged.connect(self.content_changed)
         self.setLayout(layout)
 
-    def render_label_impl(self):
-        """Render the label using the render engine and the selected image file.
+    def render_job(self):
+        """Return a function which renders the selected image file.
 
         Returns
         -------
-            QPixmap: The rendered label as a QPixmap.
+            Callable[[], Image.Image]: Renders the label image.
         """
-        return self.render_engine.render_picture(self.label.text())
+        return functools.partial(self.render_engine.render_picture, self.label.text())
+
+    def source_stamp(self):
+        """Return the modification time and size of the selected image file."""
+        return file_stamp(self.label.text())
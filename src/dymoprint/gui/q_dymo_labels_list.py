@@ -1,18 +1,85 @@
-from typing import Optional
+import functools
+import traceback
+from typing import Callable, List, Optional, Tuple
 
 from PIL import Image
 from PyQt6 import QtCore
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer
 from PyQt6.QtGui import QAction
-from PyQt6.QtWidgets import QAbstractItemView, QListWidget, QListWidgetItem, QMenu
+from PyQt6.QtWidgets import (
+    QAbstractItemView,
+    QListWidget,
+    QListWidgetItem,
+    QMenu,
+    QMessageBox,
+)
 
 from dymoprint.gui.q_dymo_label_widgets import (
     BarcodeDymoLabelWidget,
+    BaseDymoLabelWidget,
     ImageDymoLabelWidget,
     QrDymoLabelWidget,
     TextDymoLabelWidget,
 )
+from dymoprint.lib.config_file import InvalidConfigValue, get_config_file
 from dymoprint.lib.dymo_print_engines import DymoRenderEngine
 
+# Changes within this time of each other are rendered together, e.g. when typing
+RENDER_DELAY_MS = 50
+
+RenderErrors = List[Tuple[BaseException, str]]
+"""The errors of the rendering of items, with their tracebacks."""
+
+
+def _identity(bitmap: Image.Image) -> Image.Image:
+    return bitmap
+
+
+class _RenderSignals(QObject):
+    # The generation of the render, the label bitmap, the bitmaps of the items
+    # (None if they failed to render), and the errors
+    finished = QtCore.pyqtSignal(int, object, list, list)
+
+
+class _RenderTask(QRunnable):
+    """Render the items of a label, and merge them, in a render thread.
+
+    Items which are cached are given as jobs which return the cached bitmap.
+    """
+
+    def __init__(
+        self,
+        generation: int,
+        jobs: List[Callable[[], Image.Image]],
+        render_empty: Callable[[], Image.Image],
+        merge: Callable[..., Image.Image],
+        signals: _RenderSignals,
+    ):
+        super().__init__()
+        self.generation = generation
+        self.jobs = jobs
+        self.render_empty = render_empty
+        self.merge = merge
+        self.signals = signals
+
+    def run(self):
+        bitmaps: List[Optional[Image.Image]] = []
+        errors: RenderErrors = []
+        for job in self.jobs:
+            try:
+                bitmaps.append(job())
+            except BaseException as err:  # noqa: BLE001
+                errors.append((err, traceback.format_exc()))
+                bitmaps.append(None)
+        try:
+            label_bitmap = self.merge(
+                bitmaps=[b if b is not None else self.render_empty() for b in bitmaps]
+            )
+        except BaseException as err:  # noqa: BLE001
+            errors.append((err, traceback.format_exc()))
+            label_bitmap = None
+        self.signals.finished.emit(self.generation, label_bitmap, bitmaps, errors)
+
 
 class QDymoLabelList(QListWidget):
     """A custom QListWidget for displaying and managing Dymo label widgets.
@@ -22,6 +89,11 @@ class QDymoLabelList(QListWidget):
         render_engine (RenderEngine): The render engine to use for rendering the label.
         parent (QWidget): The parent widget of this QListWidget.
 
+    The label is rendered in a render thread, so that typing doesn't lag. Changes
+    are rendered together if they come within RENDER_DELAY_MS, and results which
+    are outdated by later changes are dropped. Only the items which changed are
+    rendered again, the bitmaps of the others are cached by their widgets.
+
     Attributes:
     ----------
         renderSignal (QtCore.pyqtSignal): A signal emitted when the label is rendered.
@@ -35,8 +107,8 @@ class QDymoLabelList(QListWidget):
             the label rendering.
         update_render_engine(self, render_engine): Updates the render engine used
             for rendering the label.
-        render_label(self): Renders the label using the current render engine and
-            emits the renderSignal.
+        render_label(self): Schedules rendering the label using the current render
+            engine, which emits the renderSignal when done.
         contextMenuEvent(self, event): Overrides the default context menu event to
             add or delete label widgets.
     """
@@ -52,6 +124,21 @@ class QDymoLabelList(QListWidget):
         self.min_payload_len_px = min_payload_len_px
         self.justify = justify
         self.render_engine = render_engine
+        # A single render thread, since the render cache isn't thread-safe
+        self._render_pool = QThreadPool(self)
+        self._render_pool.setMaxThreadCount(1)
+        self._render_signals = _RenderSignals(self)
+        self._render_signals.finished.connect(self._render_finished)
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.setInterval(RENDER_DELAY_MS)
+        self._render_timer.timeout.connect(self._start_render)
+        self._render_generation = 0
+        # The widgets which are being rendered, with the versions of their settings
+        # and the stamps of their sources
+        self._render_items: List[Tuple[BaseDymoLabelWidget, int, object]] = []
+        self._rendering = False
+        self._render_pending = False
         self.setAlternatingRowColors(True)
         self.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
         for item_widget in [TextDymoLabelWidget(self.render_engine)]:
@@ -92,22 +179,84 @@ class QDymoLabelList(QListWidget):
         self.render_label()
 
     def render_label(self):
-        """Render the label using the current render engine and emit renderSignal."""
-        bitmaps = []
+        """Schedule rendering the label, which emits renderSignal when done."""
+        self._render_timer.start()
+
+    def _start_render(self):
+        if self._rendering:
+            # Render again when the current render is done
+            self._render_pending = True
+            return
+        render_cache = self.render_engine.render_cache
+        if render_cache is not None:
+            # The render thread is idle, so the cache can be changed here
+            try:
+                render_cache.resize(get_config_file().render_cache_bytes)
+            except InvalidConfigValue as e:
+                print(e)
+        jobs: List[Callable[[], Image.Image]] = []
+        self._render_items = []
         for i in range(self.count()):
             item = self.item(i)
             item_widget = self.itemWidget(self.item(i))
             if item_widget and item:
                 item.setSizeHint(item_widget.sizeHint())
-                bitmaps.append(item_widget.render_label())
-        label_bitmap = self.render_engine.merge_render(
-            bitmaps=bitmaps,
+                bitmap = item_widget.cached_bitmap
+                if bitmap is not None:
+                    jobs.append(functools.partial(_identity, bitmap))
+                else:
+                    jobs.append(item_widget.render_job())
+                self._render_items.append(
+                    (
+                        item_widget,
+                        item_widget.render_version,
+                        item_widget.source_stamp(),
+                    )
+                )
+        merge = functools.partial(
+            self.render_engine.merge_render,
             min_payload_len_px=self.min_payload_len_px,
             max_payload_len_px=None,
             justify=self.justify,
         )
+        self._render_generation += 1
+        self._rendering = True
+        self._render_pool.start(
+            _RenderTask(
+                self._render_generation,
+                jobs,
+                self.render_engine.render_empty,
+                merge,
+                self._render_signals,
+            )
+        )
 
-        self.renderSignal.emit(label_bitmap)
+    def _render_finished(
+        self,
+        generation: int,
+        label_bitmap: Optional[Image.Image],
+        bitmaps: List[Optional[Image.Image]],
+        errors: RenderErrors,
+    ):
+        self._rendering = False
+        # Even outdated results have the bitmaps of the items which didn't change
+        for (item_widget, render_version, source_stamp), bitmap in zip(
+            self._render_items, bitmaps
+        ):
+            if bitmap is not None:
+                item_widget.cache_bitmap(render_version, source_stamp, bitmap)
+        if self._render_pending:
+            self._render_pending = False
+            self._start_render()
+        if generation != self._render_generation:
+            # The label changed while it was rendered
+            return
+        for err, formatted_traceback in errors:
+            QMessageBox.warning(
+                self, "Render fail!", f"{err}\n\n\n{formatted_traceback}"
+            )
+        if label_bitmap is not None:
+            self.renderSignal.emit(label_bitmap)
 
     def contextMenuEvent(self, event):
         """Override the default context menu event to add or delete label widgets.
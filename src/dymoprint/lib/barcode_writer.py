@@ -109,3 +109,10 @@ class BarcodeImageWriter(BaseWriter):
         filename = f"{filename}.{self.format.lower()}"
         output.save(filename, self.format.upper())
         return filename
+
+
+class BarcodeSizeWriter(BarcodeImageWriter):
+    """Compute the size of the image BarcodeImageWriter renders, without drawing."""
+
+    def render(self, code):
+        return self.calculate_size(len(code[0]), len(code), self.dpi)
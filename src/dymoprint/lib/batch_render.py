@@ -0,0 +1,140 @@
+"""Render many labels in parallel across a pool of worker processes."""
+
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, Sequence, Union
+
+from dymoprint.lib.config_file import get_config_file
+from dymoprint.lib.dymo_print_engines import DymoRenderEngine, get_font
+from dymoprint.lib.label_raster import LabelRaster
+from dymoprint.lib.label_spec import LabelSpec, render_label_spec
+from dymoprint.lib.render_cache import RenderCache
+
+RenderResult = Union[LabelRaster, Exception]
+
+_worker_engine: DymoRenderEngine | None = None
+
+
+def _init_worker(
+    tape_size_mm: int,
+    text_backend: str,
+    warm_fonts: Sequence[str],
+    warm_barcodes: Sequence[str],
+) -> None:
+    """Set up the render engine of a worker and warm its caches."""
+    global _worker_engine
+    _worker_engine = DymoRenderEngine(
+        tape_size_mm,
+        text_backend=text_backend,
+        render_cache=RenderCache(get_config_file().render_cache_bytes),
+    )
+    for font_file_name in warm_fonts:
+        for num_lines in (1, 2, 3):
+            geometry = _worker_engine.text_geometry(
+                num_lines=num_lines, frame_width_px=None
+            )
+            get_font(font_file_name, geometry.font_size_px)
+    if warm_barcodes:
+        import barcode
+
+        for bar_code_type in warm_barcodes:
+            barcode.get_barcode_class(bar_code_type)
+
+
+def _render_raster(render_engine: DymoRenderEngine, spec: LabelSpec) -> RenderResult:
+    try:
+        return LabelRaster.from_image(render_label_spec(render_engine, spec))
+    except Exception as e:  # noqa: BLE001
+        return e
+
+
+def _render_chunk(specs: list[LabelSpec]) -> list[RenderResult]:
+    assert _worker_engine is not None
+    return [_render_raster(_worker_engine, spec) for spec in specs]
+
+
+def _chunked(specs: Iterable[LabelSpec], chunksize: int) -> Iterator[list[LabelSpec]]:
+    spec_iter = iter(specs)
+    while chunk := list(islice(spec_iter, chunksize)):
+        yield chunk
+
+
+def render_batch(
+    specs: Iterable[LabelSpec],
+    tape_size_mm: int = 12,
+    text_backend: str = "freetype",
+    max_workers: int | None = None,
+    chunksize: int = 32,
+    warm_fonts: Sequence[str] = (),
+    warm_barcodes: Sequence[str] = (),
+    return_exceptions: bool = False,
+) -> Iterator[RenderResult]:
+    """Render label specs in worker processes and yield the packed label rasters.
+
+    Results are yielded in the order of the specs. The specs are consumed lazily,
+    and only a few chunks per worker are in flight at any time, so arbitrarily long
+    jobs run with bounded memory.
+
+    Args:
+    ----
+        specs: The labels to render.
+        tape_size_mm: The tape size which all labels are rendered for.
+        text_backend: The text backend of the render engines.
+        max_workers: Number of worker processes, defaults to the number of CPUs.
+            With 0, the labels are rendered in the calling process.
+        chunksize: Number of labels which are sent to a worker at once.
+        warm_fonts: Font files which are loaded by each worker before rendering.
+        warm_barcodes: Barcode types which are looked up by each worker before
+            rendering.
+        return_exceptions: If true, a label which fails to render yields its
+            exception instead of raising it, and the remaining labels are rendered.
+    """
+    if max_workers == 0:
+        render_engine = DymoRenderEngine(
+            tape_size_mm,
+            text_backend=text_backend,
+            render_cache=RenderCache(get_config_file().render_cache_bytes),
+        )
+        results: Iterable[RenderResult] = (
+            _render_raster(render_engine, spec) for spec in specs
+        )
+    else:
+        results = _render_in_pool(
+            specs,
+            max_workers=max_workers or os.cpu_count() or 1,
+            chunksize=chunksize,
+            initargs=(
+                tape_size_mm,
+                text_backend,
+                tuple(warm_fonts),
+                tuple(warm_barcodes),
+            ),
+        )
+    for result in results:
+        if isinstance(result, Exception) and not return_exceptions:
+            raise result
+        yield result
+
+
+def _render_in_pool(
+    specs: Iterable[LabelSpec],
+    *,
+    max_workers: int,
+    chunksize: int,
+    initargs: tuple,
+) -> Iterator[RenderResult]:
+    max_pending = 2 * max_workers
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=initargs
+    ) as executor:
+        pending: deque[Future[list[RenderResult]]] = deque()
+        for chunk in _chunked(specs, chunksize):
+            pending.append(executor.submit(_render_chunk, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -1,8 +1,26 @@
+"""The user's settings in dymoprint.ini.
+
+The config file is parsed once per process by get_config_file(), and parsed again
+only when its modification time or size changes, so the settings can be read as
+often as needed.
+"""
+
+from __future__ import annotations
+
 from configparser import ConfigParser
+from functools import lru_cache
 from pathlib import Path
 
 from platformdirs import user_config_dir
 
+from dymoprint.lib.constants import (
+    PRINTER_MODELS,
+    UNKNOWN_PRINTER_MODEL,
+    PrinterModel,
+)
+from dymoprint.lib.render_cache import DEFAULT_MAX_BYTES
+from dymoprint.lib.telemetry import default_telemetry_log_path
+
 
 class SectionNotFound(Exception):
     def __init__(self, config_file_path, section_name):
@@ -10,24 +28,188 @@ class SectionNotFound(Exception):
         super().__init__(msg)
 
 
+class InvalidConfigValue(ValueError):
+    def __init__(self, config_file_path, section_name, option, value):
+        msg = (
+            f"Invalid value {value!r} for {option} in section {section_name} "
+            f"of {config_file_path}"
+        )
+        super().__init__(msg)
+
+
 class ConfigFile:
     _CONFIG_FILE_PATH = Path(user_config_dir()) / "dymoprint.ini"
     _config_parser = None
 
-    def __init__(self):
+    def __init__(self, path: Path | None = None):
+        self.path = path or self._CONFIG_FILE_PATH
+        self._stamp: tuple[int, int] | None = None
+        self._load()
+
+    def _load(self) -> None:
+        """Parse the config file, or forget it if it's missing."""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            self._stamp = None
+            self._config_parser = None
+            return
         config_parser = ConfigParser()
-        if config_parser.read(self._CONFIG_FILE_PATH):
-            self._config_parser = config_parser
+        self._config_parser = config_parser if config_parser.read(self.path) else None
+        self._stamp = (stat.st_mtime_ns, stat.st_size)
+
+    def reload_if_changed(self) -> bool:
+        """Parse the config file again if it changed on disk since it was read."""
+        try:
+            stat = self.path.stat()
+            stamp: tuple[int, int] | None = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self._stamp:
+            return False
+        self._load()
+        return True
+
+    def has_section(self, section_name: str) -> bool:
+        self.reload_if_changed()
+        return bool(
+            self._config_parser and self._config_parser.has_section(section_name)
+        )
 
     def section(self, section_name):
         """Return the given config file section as dict."""
+        self.reload_if_changed()
         if self._config_parser:
             try:
                 return dict(self._config_parser[section_name])
             except KeyError:
-                raise SectionNotFound(self._CONFIG_FILE_PATH, section_name) from None
+                raise SectionNotFound(self.path, section_name) from None
         return None
 
+    def _get_option(self, section_name: str, option: str) -> str | None:
+        if not self.has_section(section_name):
+            return None
+        assert self._config_parser is not None
+        return self._config_parser.get(section_name, option, fallback=None)
+
+    def _get_int(
+        self, section_name: str, option: str, fallback: int | None, minimum: int
+    ) -> int | None:
+        """Read an integer option, falling back if the option or section is missing."""
+        value = self._get_option(section_name, option)
+        if value is None:
+            return fallback
+        try:
+            number = int(value)
+        except ValueError:
+            number = minimum - 1
+        if number < minimum:
+            raise InvalidConfigValue(self.path, section_name, option, value)
+        return number
+
+    def _get_positive_float(
+        self, section_name: str, option: str, fallback: float | None
+    ) -> float | None:
+        value = self._get_option(section_name, option)
+        if value is None:
+            return fallback
+        try:
+            number = float(value)
+        except ValueError:
+            number = 0
+        if not number > 0:
+            raise InvalidConfigValue(self.path, section_name, option, value)
+        return number
+
+    def _get_sizes(
+        self, section_name: str, option: str, fallback: tuple[int, ...]
+    ) -> tuple[int, ...]:
+        """Read a comma-separated list of positive integers."""
+        value = self._get_option(section_name, option)
+        if value is None:
+            return fallback
+        try:
+            sizes = tuple(int(size) for size in value.split(","))
+        except ValueError:
+            sizes = ()
+        if not sizes or min(sizes) < 1:
+            raise InvalidConfigValue(self.path, section_name, option, value)
+        return sizes
+
     @property
     def fonts_section(self):
+        """The font files by style name, or None if no fonts are configured."""
+        if not self.has_section("FONTS"):
+            return None
         return self.section("FONTS")
+
+    def printer_model(self, product_id: int) -> PrinterModel:
+        """Return the capabilities of a printer model, with the overrides of the file.
+
+        The [PRINTER] section overrides the capabilities of all models, and a section
+        like [PRINTER 0x1002] those of the model with that product ID.
+        """
+        model = PRINTER_MODELS.get(product_id, UNKNOWN_PRINTER_MODEL)
+        for section_name in ("PRINTER", f"PRINTER {product_id:#06x}"):
+            synwait = self._get_int(section_name, "synwait", model.synwait, minimum=1)
+            max_lines = self._get_int(
+                section_name, "max_lines", model.max_lines, minimum=1
+            )
+            bytes_per_line = self._get_int(
+                section_name, "bytes_per_line", model.bytes_per_line, minimum=1
+            )
+            assert synwait is not None
+            assert max_lines is not None
+            assert bytes_per_line is not None
+            model = model._replace(
+                tape_sizes_mm=self._get_sizes(
+                    section_name, "tape_sizes", model.tape_sizes_mm
+                ),
+                bytes_per_line=bytes_per_line,
+                print_speed_mm_s=self._get_positive_float(
+                    section_name, "print_speed", model.print_speed_mm_s
+                ),
+                max_lines=max_lines,
+                synwait=synwait,
+            )
+        return model
+
+    @property
+    def render_cache_bytes(self) -> int:
+        """Size limit of the render cache."""
+        size_mb = self._get_int("PERFORMANCE", "render_cache_mb", None, minimum=0)
+        if size_mb is None:
+            return DEFAULT_MAX_BYTES
+        return size_mb * 1024 * 1024
+
+    @property
+    def workers(self) -> int | None:
+        """Number of batch rendering processes, or None for the number of CPUs.
+
+        Zero renders in the main process.
+        """
+        return self._get_int("PERFORMANCE", "workers", None, minimum=0)
+
+    @property
+    def telemetry_log(self) -> Path | None:
+        """The log file of print jobs, or None if telemetry is disabled."""
+        if not self.has_section("TELEMETRY"):
+            return None
+        assert self._config_parser is not None
+        try:
+            enabled = self._config_parser.getboolean(
+                "TELEMETRY", "enabled", fallback=False
+            )
+        except ValueError:
+            value = self._config_parser.get("TELEMETRY", "enabled")
+            raise InvalidConfigValue(self.path, "TELEMETRY", "enabled", value) from None
+        if not enabled:
+            return None
+        log = self._config_parser.get("TELEMETRY", "log", fallback=None)
+        return Path(log).expanduser() if log else default_telemetry_log_path()
+
+
+@lru_cache(maxsize=None)
+def get_config_file() -> ConfigFile:
+    """Return the config file of the process, which reloads itself on changes."""
+    return ConfigFile()
@@ -14,20 +14,30 @@
 # Please beware that DEV_NODE must be set to None when not used, else you will
 # be bitten by the NameError exception.
 
+from __future__ import annotations
+
 from pathlib import Path
+from typing import NamedTuple
 
 import dymoprint.resources.fonts
 import dymoprint.resources.icons
 
-try:
-    from pyqrcode import QRCode
+_QR_ATTRIBUTES = ("QRCode", "USE_QR", "e_qrcode")
+
 
-    USE_QR = True
-    e_qrcode = None
-except ImportError as error:
-    e_qrcode = error
-    USE_QR = False
-    QRCode = None
+def __getattr__(name):
+    # pyqrcode is imported when QR codes are first needed, see PEP 562
+    if name not in _QR_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    values: tuple
+    try:
+        from pyqrcode import QRCode
+    except ImportError as error:
+        values = (None, False, error)
+    else:
+        values = (QRCode, True, None)
+    globals().update(zip(_QR_ATTRIBUTES, values))
+    return globals()[name]
 
 
 DESCRIPTION = (
@@ -37,18 +47,114 @@ UNCONFIRMED_MESSAGE = (
     "WARNING: This device is not confirmed to work with this software. Please "
     "report your experiences in https://github.com/computerlyrik/dymoprint/issues/44"
 )
+
+
+DEFAULT_SYNWAIT = 64
+DEFAULT_MAX_LINES = 200
+
+
+class PrinterModel(NamedTuple):
+    """What a printer model supports, and how labels are sent to it."""
+
+    name: str
+    tape_sizes_mm: tuple[int, ...]
+    bytes_per_line: int
+    """Width of the print head in bytes, which limits the lines of wide tapes."""
+    print_speed_mm_s: float | None = None
+    """Approximate print speed, or None if it's unknown.
+
+    The speeds of the known models haven't been measured yet. When it's set in
+    dymoprint.ini, the status requests wait long enough for a chunk to print.
+    """
+    max_lines: int = DEFAULT_MAX_LINES
+    """Number of lines after which long labels are split into several jobs."""
+    synwait: int = DEFAULT_SYNWAIT
+    """Number of lines sent in one chunk before waiting for the printer's status."""
+    confirmed: bool = True
+    """Whether the model is confirmed to work with this software."""
+
+
+PRINTER_MODELS = {
+    0x0011: PrinterModel(
+        name="DYMO LabelMANAGER PC",
+        tape_sizes_mm=(6, 9, 12),
+        bytes_per_line=8,
+    ),
+    0x0015: PrinterModel(
+        name="LabelPoint 350",
+        tape_sizes_mm=(6, 9, 12),
+        bytes_per_line=8,
+    ),
+    0x1001: PrinterModel(
+        name="LabelManager PnP (no mode switch)",
+        tape_sizes_mm=(6, 9, 12),
+        bytes_per_line=8,
+    ),
+    0x1002: PrinterModel(
+        name="LabelManager PnP (mode switch)",
+        tape_sizes_mm=(6, 9, 12),
+        bytes_per_line=8,
+    ),
+    0x1003: PrinterModel(
+        name="LabelManager 420P (no mode switch)",
+        tape_sizes_mm=(6, 9, 12, 19),
+        bytes_per_line=12,
+        confirmed=False,
+    ),
+    0x1004: PrinterModel(
+        name="LabelManager 420P (mode switch)",
+        tape_sizes_mm=(6, 9, 12, 19),
+        bytes_per_line=12,
+        confirmed=False,
+    ),
+    0x1005: PrinterModel(
+        name="LabelManager 280 (no mode switch)",
+        tape_sizes_mm=(6, 9, 12),
+        bytes_per_line=8,
+    ),
+    0x1006: PrinterModel(
+        name="LabelManager 280 (no mode switch)",
+        tape_sizes_mm=(6, 9, 12),
+        bytes_per_line=8,
+    ),
+    0x1007: PrinterModel(
+        name="LabelManager Wireless PnP (no mode switch)",
+        tape_sizes_mm=(6, 9, 12, 19, 24),
+        bytes_per_line=16,
+        confirmed=False,
+    ),
+    0x1008: PrinterModel(
+        name="LabelManager Wireless PnP (mode switch)",
+        tape_sizes_mm=(6, 9, 12, 19, 24),
+        bytes_per_line=16,
+        confirmed=False,
+    ),
+    0x1009: PrinterModel(
+        name="MobileLabeler",
+        tape_sizes_mm=(6, 9, 12, 19, 24),
+        bytes_per_line=16,
+        confirmed=False,
+    ),
+}
+"""The capabilities of the known models by product ID.
+
+They can be overridden in the [PRINTER] sections of dymoprint.ini, see
+ConfigFile.printer_model().
+"""
+
+UNKNOWN_PRINTER_MODEL = PrinterModel(
+    name="Unknown model",
+    tape_sizes_mm=(6, 9, 12, 19, 24),
+    bytes_per_line=16,
+    confirmed=False,
+)
+"""Assumed for printers which aren't in PRINTER_MODELS."""
+
 SUPPORTED_PRODUCTS = {
-    0x0011: "DYMO LabelMANAGER PC",
-    0x0015: "LabelPoint 350",
-    0x1001: "LabelManager PnP (no mode switch)",
-    0x1002: "LabelManager PnP (mode switch)",
-    0x1003: f"LabelManager 420P (no mode switch) {UNCONFIRMED_MESSAGE}",
-    0x1004: f"LabelManager 420P (mode switch) {UNCONFIRMED_MESSAGE}",
-    0x1005: "LabelManager 280 (no mode switch)",
-    0x1006: "LabelManager 280 (no mode switch)",
-    0x1007: f"LabelManager Wireless PnP (no mode switch) {UNCONFIRMED_MESSAGE}",
-    0x1008: f"LabelManager Wireless PnP (mode switch) {UNCONFIRMED_MESSAGE}",
-    0x1009: f"MobileLabeler {UNCONFIRMED_MESSAGE}",
+    product_id: (
+        model.name if model.confirmed else f"{model.name} {UNCONFIRMED_MESSAGE}"
+    )
+    for product_id, model in PRINTER_MODELS.items()
 }
 DEV_VENDOR = 0x0922
 
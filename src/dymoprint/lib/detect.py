@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import platform
 from typing import NamedTuple, NoReturn
 
@@ -52,43 +54,73 @@ class DeviceDetectionError(RuntimeError):
     pass
 
 
-def detect_device() -> DetectedDevice:
+_detected_devices: dict[tuple[int, int, int], DetectedDevice] = {}
+"""Devices which were detected before, by bus, address and product ID."""
+
+
+def detect_device(verbose: bool = True) -> DetectedDevice:
+    """Find a Dymo printer and the endpoints of its printer interface.
+
+    If verbose, the devices and the steps of the detection are printed, which needs
+    requests to read the string descriptors of the devices. Otherwise the devices
+    are matched by their vendor and product IDs only, and nothing is printed.
+
+    A device which was detected before in this process is returned right away, since
+    plugging it in again gives it a new address.
+    """
     dymo_devs = list(usb.core.find(idVendor=DEV_VENDOR, find_all=True))
     if len(dymo_devs) == 0:
-        print(f"No Dymo devices found (expected vendor {hex(DEV_VENDOR)})")
-        for dev in usb.core.find(find_all=True):
-            print(
-                f"- Vendor ID: {hex(dev.idVendor):6}  "
-                f"Product ID: {hex(dev.idProduct)}"
-            )
+        if verbose:
+            print(f"No Dymo devices found (expected vendor {hex(DEV_VENDOR)})")
+            for dev in usb.core.find(find_all=True):
+                print(
+                    f"- Vendor ID: {hex(dev.idVendor):6}  "
+                    f"Product ID: {hex(dev.idProduct)}"
+                )
+        _detected_devices.clear()
         raise DeviceDetectionError("No Dymo devices found.")
-    if len(dymo_devs) > 1:
+    # Prefer the devices which are known to work
+    dymo_devs.sort(key=lambda dev: dev.idProduct not in SUPPORTED_PRODUCTS)
+    if verbose and len(dymo_devs) > 1:
         print("Found multiple Dymo devices:")
         for dev in dymo_devs:
             print(device_info(dev))
         print("Using first device.")
-        dev = dymo_devs[0]
-    else:
-        dev = dymo_devs[0]
-        print(f"Found one Dymo device: {device_info(dev)}")
+    elif verbose:
+        print(f"Found one Dymo device: {device_info(dymo_devs[0])}")
     dev = dymo_devs[0]
-    if dev.idProduct in SUPPORTED_PRODUCTS:
-        print(f"Recognized device as {SUPPORTED_PRODUCTS[dev.idProduct]}")
-    else:
-        print(f"Unrecognized device: {hex(dev.idProduct)}. {UNCONFIRMED_MESSAGE}")
+
+    # Forget the devices which were unplugged
+    connected = {(d.bus, d.address, d.idProduct) for d in dymo_devs}
+    for stale_key in _detected_devices.keys() - connected:
+        del _detected_devices[stale_key]
+    key = (dev.bus, dev.address, dev.idProduct)
+    if key in _detected_devices:
+        if verbose:
+            print("Using the device which was detected before.")
+        return _detected_devices[key]
+
+    if verbose:
+        if dev.idProduct in SUPPORTED_PRODUCTS:
+            print(f"Recognized device as {SUPPORTED_PRODUCTS[dev.idProduct]}")
+        else:
+            print(f"Unrecognized device: {hex(dev.idProduct)}. {UNCONFIRMED_MESSAGE}")
 
     try:
         dev.get_active_configuration()
-        print("Active device configuration already found.")
+        if verbose:
+            print("Active device configuration already found.")
     except usb.core.USBError:
         try:
             dev.set_configuration()
-            print("Device configuration set.")
+            if verbose:
+                print("Device configuration set.")
         except usb.core.USBError as e:
             if e.errno == 13:
-                raise RuntimeError("Access denied") from e
+                instruct_on_access_denied(dev)
             if e.errno == 16:
-                print("Device is busy, but this is okay.")
+                if verbose:
+                    print("Device is busy, but this is okay.")
             else:
                 raise
 
@@ -96,43 +128,51 @@ def detect_device() -> DetectedDevice:
         dev.get_active_configuration(), bInterfaceClass=PRINTER_INTERFACE_CLASS
     )
     if intf is not None:
-        print(f"Opened printer interface: {intf!r}")
+        if verbose:
+            print(f"Opened printer interface: {intf!r}")
     else:
         intf = usb.util.find_descriptor(
             dev.get_active_configuration(), bInterfaceClass=HID_INTERFACE_CLASS
         )
         if intf is not None:
-            print(f"Opened HID interface: {intf!r}")
+            if verbose:
+                print(f"Opened HID interface: {intf!r}")
         else:
             die("Could not open a valid interface.")
     assert isinstance(intf, usb.core.Interface)
 
     try:
         if dev.is_kernel_driver_active(intf.bInterfaceNumber):
-            print(f"Detaching kernel driver from interface {intf.bInterfaceNumber}")
+            if verbose:
+                print(f"Detaching kernel driver from interface {intf.bInterfaceNumber}")
             dev.detach_kernel_driver(intf.bInterfaceNumber)
     except NotImplementedError:
-        print(f"Kernel driver detaching not necessary on " f"{platform.system()}.")
+        if verbose:
+            print(f"Kernel driver detaching not necessary on {platform.system()}.")
     devout = usb.util.find_descriptor(
         intf,
         custom_match=(
-            lambda e: usb.util.endpoint_direction(e.bEndpointAddress)
-            == usb.util.ENDPOINT_OUT
+            lambda e: (
+                usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_OUT
+            )
         ),
     )
     devin = usb.util.find_descriptor(
         intf,
         custom_match=(
-            lambda e: usb.util.endpoint_direction(e.bEndpointAddress)
-            == usb.util.ENDPOINT_IN
+            lambda e: (
+                usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_IN
+            )
         ),
     )
 
     if not devout or not devin:
         die("The device endpoints not be found.")
-    return DetectedDevice(
+    detected_device = DetectedDevice(
         id=dev.idProduct, dev=dev, intf=intf, devout=devout, devin=devin
     )
+    _detected_devices[key] = detected_device
+    return detected_device
 
 
 def instruct_on_access_denied(dev: usb.core.Device) -> NoReturn:
@@ -0,0 +1,126 @@
+"""Keep track of the connected printer without detecting it over and over.
+
+Detecting a printer sends several requests to it, so the monitor only detects it
+again when a Dymo device is plugged in or out. On Linux with pyudev installed, this
+is signaled by udev events, and the file descriptor of the monitor can be watched
+by an event loop. Otherwise, poll() compares the bus addresses of the Dymo devices,
+which doesn't send any requests to them. In both cases, poll() retries failed
+detections while a Dymo device is connected, so it should be called periodically.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Optional, Tuple
+
+import usb
+from usb.core import NoBackendError, USBError
+
+from dymoprint.lib.constants import DEV_VENDOR
+from dymoprint.lib.detect import DetectedDevice, detect_device
+
+try:
+    import pyudev
+except ImportError:
+    pyudev = None
+
+DeviceCallback = Callable[[Optional[DetectedDevice], Optional[Exception]], None]
+"""Called with the detected device, or None and the error of the detection."""
+
+Signature = Tuple[Tuple[int, int, int], ...]
+"""The bus, address and product ID of each Dymo device."""
+
+# detect_device() raises RuntimeError via die(), and when access is denied. The
+# DeviceDetectionError it raises when no device is found is a RuntimeError, too.
+DETECTION_ERRORS = (RuntimeError, NoBackendError, USBError)
+
+
+class DeviceMonitor:
+    """The detected printer, which is updated when Dymo devices come and go."""
+
+    device: DetectedDevice | None
+    error: Exception | None
+    """Why no device was detected."""
+
+    def __init__(self, on_change: DeviceCallback | None = None) -> None:
+        self.on_change = on_change
+        self.device = None
+        self.error = None
+        self._signature: Signature | None = None
+        self._udev_monitor = None
+        if pyudev is not None:
+            try:
+                context = pyudev.Context()
+                monitor = pyudev.Monitor.from_netlink(context)
+                monitor.filter_by(subsystem="usb", device_type="usb_device")
+                monitor.start()
+            except (OSError, ImportError):
+                pass
+            else:
+                self._udev_monitor = monitor
+
+    def fileno(self) -> int | None:
+        """Return a file descriptor which is readable on udev events, if any.
+
+        poll() should be called when it's readable, and periodically anyway, to
+        notice changes without udev and to retry failed detections.
+        """
+        if self._udev_monitor is None:
+            return None
+        return self._udev_monitor.fileno()
+
+    def refresh(self) -> None:
+        """Detect the device, and notify the callback."""
+        if self._udev_monitor is None:
+            self._signature = _dymo_signature()
+        self._detect()
+
+    def _detect(self) -> None:
+        try:
+            self.device = detect_device(verbose=False)
+            self.error = None
+        except DETECTION_ERRORS as e:
+            self.device = None
+            self.error = e
+        if self.on_change is not None:
+            self.on_change(self.device, self.error)
+
+    def poll(self) -> bool:
+        """Detect the device again if Dymo devices changed.
+
+        Return whether the device was detected again.
+        """
+        if self._udev_monitor is not None:
+            changed = self._drain_udev_events()
+            # Retry devices which failed to be detected, e.g. because they were
+            # busy
+            if not changed and self.device is None:
+                changed = bool(_dymo_signature())
+        else:
+            signature = _dymo_signature()
+            changed = signature != self._signature
+            self._signature = signature
+            # Retry devices which failed to be detected
+            changed = changed or (self.device is None and bool(signature))
+        if changed:
+            self._detect()
+        return changed
+
+    def _drain_udev_events(self) -> bool:
+        assert self._udev_monitor is not None
+        changed = False
+        while (udev_device := self._udev_monitor.poll(timeout=0)) is not None:
+            if udev_device.action not in ("add", "remove"):
+                continue
+            # PRODUCT is the vendor, product and release in hex, like "922/1002/100"
+            vendor = udev_device.properties.get("PRODUCT", "").split("/")[0]
+            if not vendor or vendor.lstrip("0") == f"{DEV_VENDOR:x}":
+                changed = True
+        return changed
+
+
+def _dymo_signature() -> Signature | None:
+    try:
+        devices = usb.core.find(idVendor=DEV_VENDOR, find_all=True)
+        return tuple(sorted((d.bus, d.address, d.idProduct) for d in devices))
+    except DETECTION_ERRORS:
+        return None
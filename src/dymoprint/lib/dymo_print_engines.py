@@ -1,26 +1,140 @@
 from __future__ import annotations
 
-import array
 import math
+import time
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING, List, NamedTuple, Tuple
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from dymoprint.lib.config_file import get_config_file
+from dymoprint.lib.constants import DEFAULT_MARGIN_PX, PIXELS_PER_MM
+from dymoprint.lib.font_index import get_font_index
+from dymoprint.lib.glyph_atlas import get_glyph_atlas
+from dymoprint.lib.label_raster import LabelRaster
+from dymoprint.lib.labeler import DymoLabeler
+from dymoprint.lib.profiling import Profile, profile_stage
+from dymoprint.lib.render_cache import RenderCache, memoized
+from dymoprint.lib.telemetry import append_record, job_record, render_seconds
+from dymoprint.lib.utils import die, draw_image, scaling
 
-import barcode as barcode_module
-import usb
-from PIL import Image, ImageFont, ImageOps
+if TYPE_CHECKING:
+    from dymoprint.lib.detect import DetectedDevice
 
-from dymoprint import DymoLabeler
-from dymoprint.lib.barcode_writer import BarcodeImageWriter
-from dymoprint.lib.constants import DEFAULT_MARGIN_PX, PIXELS_PER_MM, QRCode
-from dymoprint.lib.detect import DetectedDevice
-from dymoprint.lib.utils import die, draw_image, scaling
+# python-barcode, pyqrcode and pyusb are imported by the methods which need them,
+# so that rendering text doesn't wait for them to load.
+
+# Spacing between lines, as in ImageDraw.multiline_text
+_LINE_SPACING_PX = 4
+
+
+@lru_cache(maxsize=64)
+def get_font(font_file_name: str, font_size_px: int) -> ImageFont.FreeTypeFont:
+    """Load a TrueType font, reusing fonts which were already loaded."""
+    return ImageFont.truetype(font_file_name, font_size_px)
+
+
+TextRuns = List[Tuple[str, ImageFont.FreeTypeFont]]
+"""A line of text split into runs, with the font which draws each run."""
+
+
+def text_runs(line: str, font: ImageFont.FreeTypeFont) -> TextRuns:
+    """Split a line into runs which are drawn with the font or its fallbacks.
+
+    Each character is drawn with the first font which has a glyph for it, trying
+    the given font first and then the fonts of the font index. ASCII text is
+    assumed to be covered by any font, and skips the lookup.
+    """
+    if line.isascii():
+        return [(line, font)]
+    primary = Path(str(font.path))
+    return [
+        (run, font if path == primary else get_font(str(path), int(font.size)))
+        for run, path in get_font_index().split_runs(line, primary)
+    ]
+
+
+def _draw_text_runs(
+    draw: ImageDraw.ImageDraw,
+    line_runs: list[TextRuns],
+    primary_font: ImageFont.FreeTypeFont,
+    xy: tuple[float, float],
+    align: str = "left",
+) -> None:
+    """Draw lines of runs centered on xy, like multiline_text with anchor "mm".
+
+    The line spacing and the baseline come from the metrics of the primary font.
+    """
+    ascent, descent = primary_font.getmetrics()
+    line_spacing = ascent + _LINE_SPACING_PX
+    # Distance from the vertical middle of a line to its baseline, rounded half up
+    # like FreeType rounds the middle anchor
+    middle_to_baseline = (ascent - descent + 1) // 2
+    lengths = [sum(font.getlength(run) for run, font in runs) for runs in line_runs]
+    max_length = max(lengths)
+    top = xy[1] - (len(line_runs) - 1) * line_spacing / 2.0
+    for runs, length in zip(line_runs, lengths):
+        x = xy[0] - max_length / 2.0
+        if align == "center":
+            x += (max_length - length) / 2.0
+        elif align == "right":
+            x += max_length - length
+        for run, font in runs:
+            baseline = top + middle_to_baseline
+            draw.text((x, baseline), run, font=font, anchor="ls", fill=1)
+            x += font.getlength(run)
+        top += line_spacing
+
+
+@lru_cache(maxsize=64)
+def qr_code_lines(qr_input_text: str) -> tuple[str, ...]:
+    """Encode a QR code, returning its rows of modules ("0" or "1").
+
+    Encoding is cached, so that estimating the width and then rendering a QR code
+    encodes it only once.
+    """
+    from dymoprint.lib.constants import QRCode
+
+    code = QRCode(qr_input_text, error="M")
+    return tuple(code.text(quiet_zone=1).split())
+
+
+class TextGeometry(NamedTuple):
+    """Font size and spacing of a block of text lines on a label."""
+
+    font_size_px: int
+    font_offset_px: int
+    frame_width_px: int
+
+
+TEXT_BACKENDS = ("freetype", "atlas")
+
+
+class RenderError(RuntimeError):
+    """A label can't be rendered with the given content and options."""
 
 
 class DymoRenderEngine:
     label_height_px: int
+    text_backend: str
+    """Either "freetype" to lay out text with FreeType, or "atlas" to paste glyphs
+    from a glyph atlas, which is faster for repeated text in the same font."""
 
-    def __init__(self, tape_size_mm: int = 12) -> None:
+    render_cache: RenderCache | None
+    """If set, the rendered segments are memoized in this cache."""
+
+    def __init__(
+        self,
+        tape_size_mm: int = 12,
+        text_backend: str = "freetype",
+        render_cache: RenderCache | None = None,
+    ) -> None:
         """Initialize a DymoRenderEngine object with a specified tape size."""
+        assert text_backend in TEXT_BACKENDS
         self.label_height_px = DymoLabeler.max_bytes_per_line(tape_size_mm) * 8
+        self.text_backend = text_backend
+        self.render_cache = render_cache
 
     def render_empty(self, label_len: int = 1) -> Image.Image:
         """Render an empty label image."""
@@ -58,14 +172,14 @@ class DymoRenderEngine:
 
         return canvas
 
+    @memoized()
     def render_qr(self, qr_input_text: str) -> Image.Image:
         """Render a QR code image from the input text."""
         if len(qr_input_text) == 0:
             return Image.new("1", (1, self.label_height_px))
 
         # create QR object from first string
-        code = QRCode(qr_input_text, error="M")
-        qr_text = code.text(quiet_zone=1).split()
+        qr_text = qr_code_lines(qr_input_text)
 
         # create an empty label image
         qr_scale = self.label_height_px // len(qr_text)
@@ -73,7 +187,7 @@ class DymoRenderEngine:
         label_width = len(qr_text) * qr_scale
 
         if not qr_scale:
-            die(
+            raise RenderError(
                 "Error: too much information to store in the QR code, points "
                 "are smaller than the device resolution"
             )
@@ -91,6 +205,7 @@ class DymoRenderEngine:
                         label_draw.point(pix, 1)
         return code_bitmap
 
+    @memoized()
     def render_barcode(
         self, barcode_input_text: str, bar_code_type: str
     ) -> Image.Image:
@@ -98,21 +213,27 @@ class DymoRenderEngine:
         if len(barcode_input_text) == 0:
             return Image.new("1", (1, self.label_height_px))
 
+        import barcode as barcode_module
+
+        from dymoprint.lib.barcode_writer import BarcodeImageWriter
+
         code = barcode_module.get(
             bar_code_type, barcode_input_text, writer=BarcodeImageWriter()
         )
-        code_bitmap = code.render(
-            {
-                "font_size": 0,
-                "vertical_margin": 8,
-                "module_height": self.label_height_px - 16,
-                "module_width": 2,
-                "background": "black",
-                "foreground": "white",
-            }
-        )
+        code_bitmap = code.render(self._barcode_writer_options())
         return code_bitmap
 
+    def _barcode_writer_options(self) -> dict:
+        return {
+            "font_size": 0,
+            "vertical_margin": 8,
+            "module_height": self.label_height_px - 16,
+            "module_width": 2,
+            "background": "black",
+            "foreground": "white",
+        }
+
+    @memoized()
     def render_barcode_with_text(
         self,
         barcode_input_text,
@@ -167,6 +288,7 @@ class DymoRenderEngine:
         code_bitmap.paste(text_bitmap, (text_y, text_x))
         return code_bitmap
 
+    @memoized()
     def render_text(
         self,
         text_lines: str | list[str],
@@ -190,7 +312,32 @@ class DymoRenderEngine:
         # create an empty label image
         if label_height_px is None:
             label_height_px = self.label_height_px
-        line_height = float(label_height_px) / len(text_lines)
+        geometry = self.text_geometry(
+            num_lines=len(text_lines),
+            frame_width_px=frame_width_px,
+            font_size_ratio=font_size_ratio,
+            label_height_px=label_height_px,
+        )
+        font = get_font(str(font_file_name), geometry.font_size_px)
+        return self.draw_text(
+            text_lines=text_lines,
+            font=font,
+            geometry=geometry,
+            align=align,
+            label_height_px=label_height_px,
+        )
+
+    def text_geometry(
+        self,
+        num_lines: int,
+        frame_width_px: int | None,
+        font_size_ratio: float = 0.9,
+        label_height_px: int | None = None,
+    ) -> TextGeometry:
+        """Compute the font size and spacing for the given number of text lines."""
+        if label_height_px is None:
+            label_height_px = self.label_height_px
+        line_height = float(label_height_px) / num_lines
         font_size_px = int(round(line_height * font_size_ratio))
 
         font_offset_px = int((line_height - font_size_px) / 2)
@@ -199,9 +346,28 @@ class DymoRenderEngine:
             frame_width_px = min(frame_width_px, font_offset_px)
             frame_width_px = min(frame_width_px, 3)
 
-        font = ImageFont.truetype(str(font_file_name), font_size_px)
-        boxes = (font.getbbox(line) for line in text_lines)
-        line_widths = (right - left for left, _, right, _ in boxes)
+        return TextGeometry(
+            font_size_px=font_size_px,
+            font_offset_px=font_offset_px,
+            frame_width_px=frame_width_px or 0,
+        )
+
+    def draw_text(
+        self,
+        text_lines: list[str],
+        font: ImageFont.FreeTypeFont,
+        geometry: TextGeometry,
+        align: str = "left",
+        label_height_px: int | None = None,
+    ) -> Image.Image:
+        """Draw text lines with an already resolved font and geometry."""
+        if label_height_px is None:
+            label_height_px = self.label_height_px
+        font_offset_px = geometry.font_offset_px
+        frame_width_px = geometry.frame_width_px
+
+        line_widths, line_runs = self._text_line_widths(text_lines, font)
+        atlas = get_glyph_atlas(font) if self.text_backend == "atlas" else None
         label_width_px = max(line_widths) + (font_offset_px * 2)
         text_bitmap = Image.new("1", (label_width_px, label_height_px))
         with draw_image(text_bitmap) as label_draw:
@@ -222,6 +388,23 @@ class DymoRenderEngine:
                 )
 
             # write the text into the empty image
+            if line_runs is not None:
+                _draw_text_runs(
+                    label_draw,
+                    line_runs,
+                    font,
+                    (label_width_px / 2, label_height_px / 2),
+                    align=align,
+                )
+                return text_bitmap
+            if atlas is not None:
+                atlas.draw_multiline(
+                    text_bitmap,
+                    text_lines,
+                    (label_width_px / 2, label_height_px / 2),
+                    align=align,
+                )
+                return text_bitmap
             multiline_text = "\n".join(text_lines)
             label_draw.multiline_text(
                 (label_width_px / 2, label_height_px / 2),
@@ -233,6 +416,7 @@ class DymoRenderEngine:
             )
         return text_bitmap
 
+    @memoized(file_args=("picture_path",))
     def render_picture(self, picture_path: str) -> Image.Image:
         if len(picture_path):
             if Path(picture_path).exists():
@@ -246,7 +430,7 @@ class DymoRenderEngine:
                     img = img.convert("L", palette=Image.AFFINE)
                     return ImageOps.invert(img).convert("1")
             else:
-                die(f"picture path:{picture_path}  doesn't exist ")
+                raise RenderError(f"picture path:{picture_path}  doesn't exist ")
         return Image.new("1", (1, self.label_height_px))
 
     def merge_render(
@@ -278,15 +462,8 @@ class DymoRenderEngine:
         else:
             label_bitmap = bitmaps[0]
 
-        if max_payload_len_px is not None and label_bitmap.width > max_payload_len_px:
-            excess_px = label_bitmap.width - max_payload_len_px
-            excess_mm = excess_px / PIXELS_PER_MM
-            # Round up to nearest 0.1mm
-            excess_mm = math.ceil(excess_mm * 10) / 10
-            die(
-                f"Error: Label exceeds allowed length by "
-                f"exceeds allowed length of {excess_mm:.1f} mm."
-            )
+        if max_payload_len_px is not None:
+            self.check_payload_len(label_bitmap.width, max_payload_len_px)
 
         if min_payload_len_px > label_bitmap.width:
             offset = 0
@@ -306,51 +483,242 @@ class DymoRenderEngine:
 
         return label_bitmap
 
+    def check_payload_len(self, payload_len_px: int, max_payload_len_px: int) -> None:
+        """Fail if the payload exceeds the maximum length."""
+        if payload_len_px > max_payload_len_px:
+            excess_px = payload_len_px - max_payload_len_px
+            excess_mm = excess_px / PIXELS_PER_MM
+            # Round up to nearest 0.1mm
+            excess_mm = math.ceil(excess_mm * 10) / 10
+            raise RenderError(
+                f"Error: Label exceeds allowed length by "
+                f"exceeds allowed length of {excess_mm:.1f} mm."
+            )
+
+    # The estimate_* methods compute the width of a segment, exactly as it would be
+    # rendered by the corresponding render_* method, but without drawing anything.
+
+    def estimate_test_width(self, width: int = 100) -> int:
+        return 10 + width + 2 + 40
+
+    def estimate_qr_width(self, qr_input_text: str) -> int:
+        if len(qr_input_text) == 0:
+            return 1
+        # The number of modules, including the quiet zone
+        num_modules = len(qr_code_lines(qr_input_text))
+        qr_scale = self.label_height_px // num_modules
+        if not qr_scale:
+            raise RenderError(
+                "Error: too much information to store in the QR code, points "
+                "are smaller than the device resolution"
+            )
+        return num_modules * qr_scale
+
+    def estimate_barcode_width(
+        self, barcode_input_text: str, bar_code_type: str
+    ) -> int:
+        if len(barcode_input_text) == 0:
+            return 1
+        import barcode as barcode_module
+
+        from dymoprint.lib.barcode_writer import BarcodeSizeWriter
+
+        code = barcode_module.get(
+            bar_code_type, barcode_input_text, writer=BarcodeSizeWriter()
+        )
+        width, _ = code.render(self._barcode_writer_options())
+        return width
+
+    def estimate_text_width(
+        self,
+        text_lines: str | list[str],
+        font_file_name: Path | str,
+        frame_width_px: int | None = None,
+        font_size_ratio: float = 0.9,
+    ) -> int:
+        if isinstance(text_lines, str):
+            text_lines = [text_lines]
+        if len(text_lines) == 0:
+            text_lines = [" "]
+        geometry = self.text_geometry(
+            num_lines=len(text_lines),
+            frame_width_px=frame_width_px,
+            font_size_ratio=font_size_ratio,
+        )
+        font = get_font(str(font_file_name), geometry.font_size_px)
+        line_widths, _ = self._text_line_widths(text_lines, font)
+        return max(line_widths) + geometry.font_offset_px * 2
+
+    def _text_line_widths(
+        self, text_lines: list[str], font: ImageFont.FreeTypeFont
+    ) -> tuple[list[int], list[TextRuns] | None]:
+        """Measure the width of each line of text.
+
+        If any line has characters which the font lacks, the lines are split into
+        runs of fallback fonts, and the runs are returned as well.
+        """
+        line_runs = [text_runs(line, font) for line in text_lines]
+        if any(runs != [(line, font)] for line, runs in zip(text_lines, line_runs)):
+            line_widths = [
+                round(sum(run_font.getlength(run) for run, run_font in runs))
+                for runs in line_runs
+            ]
+            return line_widths, line_runs
+        if self.text_backend == "atlas":
+            atlas = get_glyph_atlas(font)
+            return [atlas.line_width(line) for line in text_lines], None
+        boxes = (font.getbbox(line) for line in text_lines)
+        return [int(right - left) for left, _, right, _ in boxes], None
+
+    def fit_text_size(
+        self,
+        text_lines: list[str],
+        font_file_name: Path | str,
+        max_width_px: int,
+        frame_width_px: int | None = None,
+        max_font_size_ratio: float = 0.9,
+    ) -> tuple[int, float] | None:
+        """Find the largest font size with which the text fits into max_width_px.
+
+        The font size is binary searched using font metrics only. Returns the font
+        size in pixels together with the corresponding font_size_ratio for
+        render_text, or None if the text doesn't fit at any size.
+        """
+        line_height = float(self.label_height_px) / max(len(text_lines), 1)
+
+        def fits(font_size_px: int) -> bool:
+            width = self.estimate_text_width(
+                text_lines=text_lines,
+                font_file_name=font_file_name,
+                frame_width_px=frame_width_px,
+                font_size_ratio=font_size_px / line_height,
+            )
+            return width <= max_width_px
+
+        low = 1
+        high = int(round(line_height * max_font_size_ratio))
+        if high >= low and fits(high):
+            return high, max_font_size_ratio
+        best = None
+        high -= 1
+        while low <= high:
+            middle = (low + high) // 2
+            if fits(middle):
+                best = middle
+                low = middle + 1
+            else:
+                high = middle - 1
+        if best is None:
+            return None
+        return best, best / line_height
+
+    def estimate_picture_width(self, picture_path: str) -> int:
+        if len(picture_path) == 0:
+            return 1
+        if not Path(picture_path).exists():
+            raise RenderError(f"picture path:{picture_path}  doesn't exist ")
+        # Opening an image only reads its header
+        with Image.open(picture_path) as img:
+            if img.height > self.label_height_px:
+                ratio = self.label_height_px / img.height
+                return int(math.ceil(img.width * ratio))
+            return img.width
+
+    def estimate_width(
+        self, segment_widths: list[int], min_payload_len_px: int = 0
+    ) -> int:
+        """Compute the payload width which merge_render produces from the segments."""
+        if len(segment_widths) == 0:
+            return max(min_payload_len_px, 1)
+        padding = 4
+        width = sum(segment_widths) + padding * (len(segment_widths) - 1)
+        return max(width, min_payload_len_px)
+
 
 def print_label(
     detected_device: DetectedDevice,
     label_bitmap: Image.Image,
     margin_px: int = DEFAULT_MARGIN_PX,
     tape_size_mm: int = 12,
+    profile: Profile | None = None,
 ) -> None:
     """Print a label bitmap to the detected printer.
 
     The label bitmap is a PIL image in 1-bit format (mode=1), and pixels with value
-    equal to 1 are burned.
+    equal to 1 are burned. If a profile is given, the stages are timed in it.
     """
+    import usb
+
     assert detected_device is not None
-    # Convert the image to the proper matrix for the dymo labeler object so that
-    # rows span the width of the label, and the first row corresponds to the left
-    # edge of the label.
-    label_rotated = label_bitmap.transpose(Image.ROTATE_270)
-
-    # Convert the image to raw bytes. Pixels along rows are chunked into groups of
-    # 8 pixels, and subsequent rows are concatenated.
-    labelstream: bytes = label_rotated.tobytes()
-
-    # Regather the bytes into rows
-    label_stream_row_length = int(math.ceil(label_bitmap.height / 8))
-    if len(labelstream) // label_stream_row_length != label_bitmap.width:
-        die("An internal problem was encountered while processing the label bitmap!")
-    label_rows: list[bytes] = [
-        labelstream[i : i + label_stream_row_length]
-        for i in range(0, len(labelstream), label_stream_row_length)
-    ]
+    with profile_stage(profile, "raster"):
+        label_raster = LabelRaster.from_image(label_bitmap)
+    print_label_raster(detected_device, label_raster, margin_px, tape_size_mm, profile)
+    with profile_stage(profile, "cleanup"):
+        usb.util.dispose_resources(detected_device.dev)
+    print("Cleaned up.")
 
-    # Convert bytes into ints
-    label_matrix: list[list[int]] = [
-        array.array("B", label_row).tolist() for label_row in label_rows
-    ]
 
+def print_label_raster(
+    detected_device: DetectedDevice,
+    label_raster: LabelRaster,
+    margin_px: int = DEFAULT_MARGIN_PX,
+    tape_size_mm: int = 12,
+    profile: Profile | None = None,
+) -> None:
+    """Print a label which was packed into a LabelRaster.
+
+    The transfer parameters are taken from the model of the printer, see
+    ConfigFile.printer_model(). The device resources are not released, so that
+    several labels can be printed in one device session. If a profile is given, the
+    transfer is timed in it, and the traffic with the printer is counted. If
+    telemetry is enabled, the job is appended to the telemetry log, with the render
+    time taken from the profile.
+    """
+    config_file = get_config_file()
+    model = config_file.printer_model(detected_device.id)
+    if label_raster.row_bytes > model.bytes_per_line:
+        die(
+            f"Error: the label is {label_raster.height_px} pixels high, but "
+            f"{model.name} can print at most {8 * model.bytes_per_line} pixels"
+        )
+    if tape_size_mm not in model.tape_sizes_mm:
+        sizes = ", ".join(str(size) for size in model.tape_sizes_mm)
+        print(
+            f"WARNING: {model.name} supports tape sizes of {sizes} mm, "
+            f"not {tape_size_mm} mm"
+        )
     lm = DymoLabeler(
         detected_device.devout,
         detected_device.devin,
-        synwait=64,
         tape_size_mm=tape_size_mm,
+        model=model,
     )
 
     print("Printing label..")
-    lm.printLabel(label_matrix, margin_px=margin_px)
+    error = None
+    start = time.perf_counter()
+    try:
+        with profile_stage(profile, "usb transfer"):
+            lm.printLabel(label_raster.rows(), margin_px=margin_px)
+    except OSError as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if (telemetry_log := config_file.telemetry_log) is not None:
+            record = job_record(
+                dev=detected_device.dev,
+                tape_size_mm=tape_size_mm,
+                label_px=label_raster.width_px,
+                num_bytes=lm.num_bytes_sent,
+                num_chunks=lm.num_chunks_sent,
+                num_status_reads=lm.num_status_reads,
+                render_seconds=render_seconds(profile.stages) if profile else None,
+                transfer_seconds=time.perf_counter() - start,
+                error=error,
+            )
+            append_record(telemetry_log, record)
+    if profile is not None:
+        profile.count("bytes sent", lm.num_bytes_sent)
+        profile.count("chunks sent", lm.num_chunks_sent)
+        profile.count("status reads", lm.num_status_reads)
     print("Done printing.")
-    usb.util.dispose_resources(detected_device.dev)
-    print("Cleaned up.")
@@ -1,10 +1,8 @@
-from enum import Enum
 from pathlib import Path
 from typing import Optional
 
-import dymoprint.resources.fonts
-from dymoprint._vendor.matplotlib import font_manager
-from dymoprint.lib.config_file import ConfigFile
+from dymoprint.lib.config_file import get_config_file
+from dymoprint.lib.font_index import DEFAULT_FONTS_DIR, FontStyle, get_font_index
 
 
 class NoFontFound(ValueError):
@@ -13,29 +11,25 @@ class NoFontFound(ValueError):
         super().__init__(msg)
 
 
-class FontStyle(Enum):
-    REGULAR = 1
-    BOLD = 2
-    ITALIC = 3
-    NARROW = 4
+_DEFAULT_FONT_FILENAME = {
+    FontStyle.REGULAR: str(DEFAULT_FONTS_DIR / "Carlito-Regular.ttf"),
+    FontStyle.BOLD: str(DEFAULT_FONTS_DIR / "Carlito-Bold.ttf"),
+    FontStyle.ITALIC: str(DEFAULT_FONTS_DIR / "Carlito-Italic.ttf"),
+    FontStyle.NARROW: str(DEFAULT_FONTS_DIR / "Carlito-BoldItalic.ttf"),
+}
 
-    @classmethod
-    def from_name(cls, name):
-        return {
-            "regular": cls.REGULAR,
-            "bold": cls.BOLD,
-            "italic": cls.ITALIC,
-            "narrow": cls.NARROW,
-        }.get(name)
 
+def default_font_path(style: FontStyle = FontStyle.REGULAR) -> str:
+    """Return the font file configured for a style, or the bundled font of the style.
 
-_DEFAULT_FONTS_DIR = Path(dymoprint.resources.fonts.__file__).parent
-_DEFAULT_FONT_FILENAME = {
-    FontStyle.REGULAR: str(_DEFAULT_FONTS_DIR / "Carlito-Regular.ttf"),
-    FontStyle.BOLD: str(_DEFAULT_FONTS_DIR / "Carlito-Bold.ttf"),
-    FontStyle.ITALIC: str(_DEFAULT_FONTS_DIR / "Carlito-Italic.ttf"),
-    FontStyle.NARROW: str(_DEFAULT_FONTS_DIR / "Carlito-BoldItalic.ttf"),
-}
+    Unlike FontConfig, a style missing from the [FONTS] section, or a configured
+    font file which doesn't exist, falls back to the bundled font.
+    """
+    if fonts_section := get_config_file().fonts_section:
+        for name, path in fonts_section.items():
+            if FontStyle.from_name(name) == style and Path(path).is_file():
+                return path
+    return _DEFAULT_FONT_FILENAME[style]
 
 
 class FontConfig:
@@ -45,7 +39,7 @@ class FontConfig:
 
     def __init__(self, font: Optional[str] = None, style: FontStyle = _DEFAULT_STYLE):
         if font is None:
-            if fonts_section := ConfigFile().fonts_section:
+            if fonts_section := get_config_file().fonts_section:
                 style_to_font_path = {
                     FontStyle.from_name(k): v for k, v in fonts_section.items()
                 }
@@ -56,19 +50,16 @@ class FontConfig:
             if Path(font).is_file():
                 self.path = font
             else:
-                self.path = self._path_from_name(name=font)
+                self.path = self._path_from_name(name=font, style=style)
         assert Path(self.path).is_file()
 
     @classmethod
-    def _path_from_name(cls, name):
-        available_fonts = cls.available_fonts()
-        matching_fonts = [f for f in available_fonts if name.lower() == f.stem.lower()]
-        if len(matching_fonts) == 0:
+    def _path_from_name(cls, name, style=_DEFAULT_STYLE):
+        path = get_font_index().find(name, style)
+        if path is None:
             raise NoFontFound(name)
-        return matching_fonts[0]
+        return path
 
     @classmethod
     def available_fonts(cls):
-        fonts = [f for f in _DEFAULT_FONTS_DIR.iterdir() if f.suffix == ".ttf"]
-        fonts.extend(Path(f) for f in font_manager.findSystemFonts())
-        return sorted(fonts, key=lambda f: f.stem.lower())
+        return get_font_index().fonts
@@ -0,0 +1,411 @@
+"""An on-disk index of the available fonts.
+
+Discovering the system fonts means running fc-list and walking every font
+directory, which is slow on machines with many fonts. The result is therefore
+stored in a cache file together with the modification times of all the font
+directories and of the fontconfig caches. As long as none of them changed, the
+index is loaded with a single file read.
+
+The index also holds the names of each font, as read from its name table, so that
+fonts can be looked up by file stem, full name, or family and style.
+
+For font fallback, the code points which each font covers are read from its cmap
+table when they are first needed, one font at a time, and stored in a second cache
+file next to the index.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import re
+import sys
+from enum import Enum
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from platformdirs import user_cache_dir
+
+import dymoprint.resources.fonts
+from dymoprint.lib.sfnt import read_cmap_ranges, read_font_names
+
+_INDEX_VERSION = 2
+
+DEFAULT_FONTS_DIR = Path(dymoprint.resources.fonts.__file__).parent
+
+_COVERAGE_VERSION = 1
+
+Stamps = Dict[str, Optional[int]]
+"""Modification times in ns of directories, or None for missing directories."""
+
+CodePointRanges = List[Tuple[int, int]]
+"""Inclusive ranges of code points."""
+
+
+class FontStyle(Enum):
+    REGULAR = 1
+    BOLD = 2
+    ITALIC = 3
+    NARROW = 4
+
+    @classmethod
+    def from_name(cls, name):
+        return {
+            "regular": cls.REGULAR,
+            "bold": cls.BOLD,
+            "italic": cls.ITALIC,
+            "narrow": cls.NARROW,
+        }.get(name)
+
+
+# The weight, width and slant which each style asks for
+_STYLE_TARGETS = {
+    FontStyle.REGULAR: (400, 5, False),
+    FontStyle.BOLD: (700, 5, False),
+    FontStyle.ITALIC: (400, 5, True),
+    FontStyle.NARROW: (400, 3, False),
+}
+
+
+class FontEntry(NamedTuple):
+    path: Path
+    family: str
+    style: str
+    """The subfamily of the font, for example "Bold Italic"."""
+    full_name: str
+    weight: int
+    width: int
+    italic: bool
+
+    @classmethod
+    def read(cls, path: Path) -> FontEntry:
+        """Read the names of a font, falling back to its file stem."""
+        try:
+            names = read_font_names(path)
+        except (OSError, ValueError):
+            return cls(path, path.stem, "Regular", path.stem, 400, 5, False)
+        return cls(path, *names)
+
+    def style_distance(self, style: FontStyle) -> float:
+        return self._distance(*_STYLE_TARGETS[style])
+
+    def _distance(self, weight: int, width: int, italic: bool) -> float:
+        return (
+            abs(self.weight - weight) / 100
+            + abs(self.width - width)
+            + 10 * (self.italic != italic)
+        )
+
+
+def _name_key(name: str) -> str:
+    """Normalize a font name, so that "DejaVu Sans Bold" matches DejaVuSans-Bold."""
+    return re.sub(r"[\s_-]+", "", name).casefold()
+
+
+def font_index_path() -> Path:
+    return Path(user_cache_dir("dymoprint")) / "font_index.json"
+
+
+def _file_stamp(path: Path) -> list[int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _read_coverage(path: Path) -> CodePointRanges:
+    try:
+        return read_cmap_ranges(path)
+    except (OSError, ValueError):
+        return []
+
+
+def _write_json(path: Path, data: object) -> None:
+    """Write a cache file, ignoring failures since the cache is optional."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tmp_path.open("w") as f:
+            json.dump(data, f)
+        # Replacing the file is atomic, so concurrent readers never see a
+        # partially written file.
+        tmp_path.replace(path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _font_roots() -> list[str]:
+    """List the directories which are searched recursively for fonts."""
+    from dymoprint._vendor.matplotlib import font_manager
+
+    if sys.platform == "win32":
+        return [font_manager.win32FontDirectory(), *font_manager.MSUserFontDirectories]
+    if sys.platform == "darwin":
+        return [*font_manager.X11FontDirectories, *font_manager.OSXFontDirectories]
+    return list(font_manager.X11FontDirectories)
+
+
+def _fontconfig_cache_dirs() -> list[str]:
+    """List the directories of the fontconfig caches, which fc-cache updates."""
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return [
+        "/var/cache/fontconfig",
+        "/usr/lib/fontconfig/cache",
+        str(Path(xdg_cache_home) / "fontconfig"),
+    ]
+
+
+def _mtime_ns(path: str) -> int | None:
+    try:
+        return Path(path).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _collect_stamps(roots: list[str], flat_dirs: list[str]) -> Stamps:
+    """Record the modification times of the font directories.
+
+    The roots are recorded with all their subdirectories. Adding or removing a font
+    changes the modification time of its directory, and adding a subdirectory
+    changes the one of its parent, so the stamps change whenever the fonts found by
+    walking the roots change.
+    """
+    stamps: Stamps = {}
+    for root in roots:
+        stamps[root] = _mtime_ns(root)
+        if stamps[root] is None:
+            continue
+        for dirpath, dirnames, _ in os.walk(root):
+            for dirname in dirnames:
+                path = str(Path(dirpath, dirname))
+                stamps[path] = _mtime_ns(path)
+    for path in flat_dirs:
+        stamps[path] = _mtime_ns(path)
+    return stamps
+
+
+def _stamps_are_current(stamps: Stamps) -> bool:
+    return all(_mtime_ns(path) == mtime_ns for path, mtime_ns in stamps.items())
+
+
+class Coverage:
+    """The code points which a font covers, looked up by bisecting its ranges."""
+
+    def __init__(self, ranges: CodePointRanges) -> None:
+        # Merge overlapping and adjacent ranges, so that each code point is in the
+        # range with the last start before it, if in any
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        for start, end in sorted(ranges):
+            if self._ends and start <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    def __contains__(self, code_point: int) -> bool:
+        i = bisect.bisect_right(self._starts, code_point) - 1
+        return i >= 0 and code_point <= self._ends[i]
+
+
+class FontIndex:
+    """The fonts which are bundled with dymoprint or installed on the system."""
+
+    entries: list[FontEntry]
+    """The fonts, sorted by the case-insensitive stem of their file."""
+
+    def __init__(self, entries: list[FontEntry], path: Path | None = None) -> None:
+        self.entries = sorted(entries, key=lambda e: e.path.stem.lower())
+        self.path = path
+        """The cache file of the index, if any."""
+        self._coverage: dict[Path, Coverage] = {}
+        # The contents of the coverage cache file, loaded when first needed
+        self._cached_coverage: dict[str, dict] | None = None
+        self._cached_coverage_changed = False
+        self._font_for_char: dict[tuple[Path, str], Path] = {}
+        self._by_path = {entry.path: entry for entry in self.entries}
+        self._by_stem: dict[str, FontEntry] = {}
+        self._by_full_name: dict[str, FontEntry] = {}
+        self._by_family: dict[str, list[FontEntry]] = {}
+        for entry in self.entries:
+            self._by_stem.setdefault(_name_key(entry.path.stem), entry)
+            self._by_full_name.setdefault(_name_key(entry.full_name), entry)
+            self._by_family.setdefault(_name_key(entry.family), []).append(entry)
+
+    @property
+    def fonts(self) -> list[Path]:
+        """The font files, sorted by their case-insensitive stem."""
+        return [entry.path for entry in self.entries]
+
+    def find(self, name: str, style: FontStyle = FontStyle.REGULAR) -> Path | None:
+        """Look up a font by file stem, family, or full name, in this order.
+
+        Names are matched case-insensitively, ignoring spaces, hyphens and
+        underscores. A file stem names an exact file, so it comes first. If the
+        name is a family, the style picks the member of the family which matches
+        best.
+        """
+        key = _name_key(name)
+        entry = self._by_stem.get(key)
+        if entry is None and key in self._by_family:
+            entry = min(self._by_family[key], key=lambda e: e.style_distance(style))
+        if entry is None:
+            entry = self._by_full_name.get(key)
+        return entry.path if entry is not None else None
+
+    def coverage(self, font_path: Path) -> Coverage:
+        """Return the code points which a font has glyphs for."""
+        coverage = self._coverage.get(font_path)
+        if coverage is None:
+            coverage = self._coverage[font_path] = Coverage(
+                self._coverage_ranges(font_path)
+            )
+        return coverage
+
+    def _coverage_path(self) -> Path | None:
+        return self.path and self.path.with_name("font_coverage.json")
+
+    def _coverage_ranges(self, font_path: Path) -> CodePointRanges:
+        """Read the coverage of a font, from the cache file if it's indexed.
+
+        Indexed fonts which are missing from the cache file, or which changed since,
+        are read again, and the cache file is updated by _save_coverage().
+        """
+        if font_path not in self._by_path:
+            # Fonts which are not in the index, like font files given by path
+            return _read_coverage(font_path)
+        if self._cached_coverage is None:
+            self._cached_coverage = {}
+            coverage_path = self._coverage_path()
+            if coverage_path is not None:
+                try:
+                    with coverage_path.open() as f:
+                        data = json.load(f)
+                    if data["version"] == _COVERAGE_VERSION:
+                        self._cached_coverage = data["fonts"]
+                except (OSError, ValueError, KeyError, TypeError):
+                    pass
+        key = str(font_path)
+        stamp = _file_stamp(font_path)
+        cached = self._cached_coverage.get(key)
+        if cached is None or cached["stamp"] != stamp:
+            cached = {"stamp": stamp, "ranges": _read_coverage(font_path)}
+            self._cached_coverage[key] = cached
+            self._cached_coverage_changed = True
+        return cached["ranges"]
+
+    def _save_coverage(self) -> None:
+        """Write the coverage which was read since the last save to the cache file.
+
+        Fonts which are no longer indexed are dropped from the cache file.
+        """
+        coverage_path = self._coverage_path()
+        if not self._cached_coverage_changed or coverage_path is None:
+            return
+        assert self._cached_coverage is not None
+        fonts = {
+            key: font
+            for key, font in self._cached_coverage.items()
+            if Path(key) in self._by_path
+        }
+        _write_json(coverage_path, {"version": _COVERAGE_VERSION, "fonts": fonts})
+        self._cached_coverage_changed = False
+
+    def fallback_fonts(self, primary: Path) -> list[Path]:
+        """List the fonts to try for characters which the primary font lacks.
+
+        Fonts with a style closer to the one of the primary font come first.
+        """
+        entry = self._by_path.get(primary) or FontEntry.read(primary)
+        style = (entry.weight, entry.width, entry.italic)
+        candidates = [e for e in self.entries if e.path != primary]
+        candidates.sort(key=lambda e: e._distance(*style))
+        return [e.path for e in candidates]
+
+    def font_for_char(self, char: str, primary: Path) -> Path:
+        """Return the first font which covers a character, trying primary first.
+
+        If no font covers the character, the primary font is returned.
+        """
+        key = (primary, char)
+        font_path = self._font_for_char.get(key)
+        if font_path is None:
+            font_path = primary
+            code_point = ord(char)
+            if not char.isspace() and code_point not in self.coverage(primary):
+                for fallback in self.fallback_fonts(primary):
+                    if code_point in self.coverage(fallback):
+                        font_path = fallback
+                        break
+            self._save_coverage()
+            self._font_for_char[key] = font_path
+        return font_path
+
+    def split_runs(self, text: str, primary: Path) -> list[tuple[str, Path]]:
+        """Split text into runs of characters which are drawn with the same font."""
+        runs: list[tuple[str, Path]] = []
+        for char in text:
+            font_path = self.font_for_char(char, primary)
+            if runs and runs[-1][1] == font_path:
+                runs[-1] = (runs[-1][0] + char, font_path)
+            else:
+                runs.append((char, font_path))
+        return runs
+
+    @classmethod
+    def scan(cls, path: Path | None = None) -> FontIndex:
+        """Discover the fonts without using the cache file."""
+        # The font directories are only needed when the cache file is stale
+        from dymoprint._vendor.matplotlib import font_manager
+
+        fonts = [f for f in DEFAULT_FONTS_DIR.iterdir() if f.suffix == ".ttf"]
+        fonts.extend(Path(f) for f in font_manager.findSystemFonts())
+        return cls([FontEntry.read(font) for font in fonts], path)
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> FontIndex:
+        """Load the index from the cache file, rescanning the fonts if it's stale.
+
+        A fresh index is written back to the cache file. Failing to read or write
+        the cache file is not an error, the fonts are just scanned every time.
+        """
+        path = path or font_index_path()
+        try:
+            with path.open() as f:
+                data = json.load(f)
+            if data["version"] == _INDEX_VERSION and _stamps_are_current(
+                data["stamps"]
+            ):
+                return cls(
+                    [FontEntry(Path(font[0]), *font[1:]) for font in data["fonts"]],
+                    path,
+                )
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        # The stamps are collected before scanning, so that fonts which are added
+        # in the meantime are found the next time.
+        stamps = _collect_stamps(
+            [str(DEFAULT_FONTS_DIR), *_font_roots()], _fontconfig_cache_dirs()
+        )
+        index = cls.scan(path)
+        index._save(stamps)
+        return index
+
+    def _save(self, stamps: Stamps) -> None:
+        assert self.path is not None
+        data = {
+            "version": _INDEX_VERSION,
+            "stamps": stamps,
+            "fonts": [(str(entry.path), *entry[1:]) for entry in self.entries],
+        }
+        _write_json(self.path, data)
+
+
+@lru_cache(maxsize=None)
+def get_font_index() -> FontIndex:
+    """Return the font index, loading it at most once per process."""
+    return FontIndex.load()
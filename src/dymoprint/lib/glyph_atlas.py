@@ -0,0 +1,244 @@
+"""Text rendering by pasting glyphs which were rasterized once per font and size.
+
+Labels are mostly printed with a small alphabet at a handful of sizes, for example
+serial numbers. Instead of laying out every line with FreeType, a glyph atlas keeps
+the 1-bit bitmap, the advance and the kerning of each glyph, and builds lines by
+pasting the glyphs at the positions FreeType would place them at, so that the output
+matches ImageDraw.multiline_text.
+"""
+
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+from typing import NamedTuple
+
+from PIL import Image, ImageFont
+
+from dymoprint.lib.utils import draw_image
+
+# Spacing between lines, as in ImageDraw.multiline_text
+_LINE_SPACING_PX = 4
+
+# Glyph which is drawn next to each rasterized glyph, to find the baseline
+_REFERENCE_CHAR = "H"
+
+# Text is drawn on 1-bit images, which ImageDraw renders with monochrome hinting
+_FONT_MODE = "1"
+
+
+def _pixel(units: int) -> int:
+    """Round a length in 1/64 px to whole pixels, like FreeType's PIXEL macro."""
+    return (units + 32) >> 6
+
+
+def _units(length: float) -> int:
+    """Convert a length from FreeTypeFont.getlength to 1/64 px."""
+    return round(length * 64)
+
+
+class Glyph(NamedTuple):
+    bitmap: Image.Image | None
+    """The 1-bit bitmap of the glyph, or None for glyphs without ink."""
+    left: int
+    """Horizontal offset of the bitmap from the pen position."""
+    top: int
+    """Vertical offset of the bitmap from the baseline."""
+    advance: int
+    """Advance of the pen, in 1/64 px."""
+    box_left: int
+    """Left edge of the glyph in FreeTypeFont.getbbox, which is at most 0."""
+    box_top: int
+    """Top edge of the glyph in FreeTypeFont.getbbox, which is at most 0."""
+
+
+class GlyphAtlas:
+    """Glyph bitmaps and metrics of one font at one size, rasterized on demand."""
+
+    def __init__(self, font: ImageFont.FreeTypeFont) -> None:
+        self.font = font
+        self._glyphs: dict[str, Glyph] = {}
+        self._kerning: dict[tuple[str, str], int] = {}
+        self._extents: dict[str, tuple[int, int, int]] = {}
+        mm_top = font.getbbox("A", anchor="mm")[1]
+        ms_top = font.getbbox("A", anchor="ms")[1]
+        # Distance from the vertical middle of a line to its baseline
+        self.middle_to_baseline = int(mm_top - ms_top)
+        self.line_spacing = (
+            int(font.getbbox("A", mode=_FONT_MODE)[3]) + _LINE_SPACING_PX
+        )
+        self._space_advance = _units(font.getlength(" ", mode=_FONT_MODE))
+
+    def glyph(self, char: str) -> Glyph:
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            glyph = self._glyphs[char] = self._rasterize(char)
+        return glyph
+
+    def _bbox(self, text: str) -> tuple[int, int, int, int]:
+        left, top, right, bottom = self.font.getbbox(text, mode=_FONT_MODE, anchor="ls")
+        return int(left), int(top), int(right), int(bottom)
+
+    def _spaces(self, width_px: int) -> str:
+        """Return enough spaces to move the pen by at least width_px."""
+        if self._space_advance <= 0 or width_px <= 0:
+            return ""
+        return " " * -(-64 * width_px // self._space_advance)
+
+    def _rasterize(self, char: str) -> Glyph:
+        box_left, box_top, box_right, box_bottom = self._bbox(char)
+        advance = _units(self.font.getlength(char, mode=_FONT_MODE))
+        empty = Glyph(None, 0, 0, advance, box_left, box_top)
+        if box_right <= box_left or box_bottom <= box_top:
+            return empty
+        # FreeType places a glyph bitmap by its own bearings, which can be a pixel
+        # off the bounding box. So the glyph is drawn after spaces, which keep it
+        # right of the text origin, and before a reference glyph, to find its bitmap
+        # relative to the pen position and to the baseline.
+        ref_left, ref_top, _, _ = self._bbox(_REFERENCE_CHAR)
+        head = self._spaces(1 - box_left) + char
+        text = head + self._spaces(box_right - ref_left + 3) + _REFERENCE_CHAR
+        pen = _units(self.font.getlength(head, mode=_FONT_MODE)) - advance
+        ref_pen = _units(self.font.getlength(text, mode=_FONT_MODE)) - _units(
+            self.font.getlength(_REFERENCE_CHAR, mode=_FONT_MODE)
+        )
+        left, top, right, bottom = self._bbox(text)
+        bitmap = Image.new("1", (right - left, bottom - top))
+        with draw_image(bitmap) as draw:
+            draw.text((-left, -top), text, font=self.font, anchor="ls", fill=1)
+        split = _pixel(ref_pen) + ref_left - 1
+        ink = bitmap.crop((0, 0, split, bitmap.height)).getbbox()
+        if ink is None:
+            return empty
+        ref_ink = bitmap.crop((split, 0, bitmap.width, bitmap.height)).getbbox()
+        baseline = ref_ink[1] - ref_top if ref_ink else -top
+        return Glyph(
+            bitmap=bitmap.crop(ink),
+            left=ink[0] - _pixel(pen),
+            top=ink[1] - baseline,
+            advance=advance,
+            box_left=box_left,
+            box_top=box_top,
+        )
+
+    def kerning(self, first: str, second: str) -> int:
+        pair = (first, second)
+        kerning = self._kerning.get(pair)
+        if kerning is None:
+            kerning = self._kerning[pair] = (
+                _units(self.font.getlength(first + second, mode=_FONT_MODE))
+                - self.glyph(first).advance
+                - self.glyph(second).advance
+            )
+        return kerning
+
+    def layout(self, line: str) -> tuple[list[tuple[int, Glyph]], int]:
+        """Return the pen position of each glyph of a line, and the line length.
+
+        Positions and the length are in 1/64 px, accumulated like FreeType does,
+        so that they are rounded to pixels only when the glyphs are placed.
+        """
+        positions = []
+        pen = 0
+        previous = None
+        for char in line:
+            if previous is not None:
+                pen += self.kerning(previous, char)
+            glyph = self.glyph(char)
+            positions.append((pen, glyph))
+            pen += glyph.advance
+            previous = char
+        return positions, pen
+
+    def _extent(self, char: str) -> tuple[int, int, int]:
+        """Return the advance in 1/64 px, and the left and right edges of a glyph.
+
+        They are measured like FreeTypeFont.getbbox measures them, with the default
+        hinting instead of the monochrome hinting of the glyph bitmaps.
+        """
+        extent = self._extents.get(char)
+        if extent is None:
+            left, _, right, _ = self.font.getbbox(char, anchor="ls")
+            advance = _units(self.font.getlength(char))
+            extent = self._extents[char] = (advance, int(left), int(right))
+        return extent
+
+    def line_width(self, line: str) -> int:
+        """Return the width of the bounding box of a line, like FreeTypeFont.getbbox.
+
+        The box spans the pen line from its origin to its end, and the glyphs.
+        """
+        left = right = pen = 0
+        previous = None
+        for char in line:
+            if previous is not None:
+                pen += self.kerning(previous, char)
+            advance, glyph_left, glyph_right = self._extent(char)
+            left = min(left, _pixel(pen) + glyph_left)
+            right = max(right, _pixel(pen) + glyph_right)
+            pen += advance
+            previous = char
+        return max(right, _pixel(pen)) - left
+
+    def draw_line(
+        self, bitmap: Image.Image, line: str, xy: tuple[float, float]
+    ) -> None:
+        """Paste the glyphs of a line centered on xy, like text with anchor "mm".
+
+        As in FreeType rendering, the fraction of xy offsets the pen in 1/64 px,
+        and each glyph is pasted at its accumulated pen position rounded to pixels.
+        """
+        positions, length = self.layout(line)
+        inked = [(_pixel(pen), g) for pen, g in positions if g.bitmap]
+        # FreeType offsets the text by the difference between the edges of its
+        # bounding box and of its glyph bitmaps
+        box_left = min([0] + [_pixel(pen) + g.box_left for pen, g in positions])
+        box_top = min([0] + [g.box_top for _, g in positions])
+        bitmap_left = min([0] + [x + g.left for x, g in inked])
+        bitmap_top = min([0] + [g.top for _, g in inked])
+        x_fraction, x = math.modf(xy[0])
+        y_fraction, y = math.modf(xy[1])
+        origin = int(x) - _pixel(length // 2) + box_left - bitmap_left
+        pen_start = int(x_fraction * 64)
+        baseline = (
+            int(y)
+            + self.middle_to_baseline
+            - _pixel(-int(y_fraction * 64))
+            + box_top
+            - bitmap_top
+        )
+        for pen, glyph in positions:
+            if glyph.bitmap is None:
+                continue
+            box = (origin + _pixel(pen_start + pen) + glyph.left, baseline + glyph.top)
+            bitmap.paste(1, box, mask=glyph.bitmap)
+
+    def draw_multiline(
+        self,
+        bitmap: Image.Image,
+        text_lines: list[str],
+        xy: tuple[float, float],
+        align: str = "left",
+    ) -> None:
+        """Draw lines centered on xy, like multiline_text with anchor "mm"."""
+        lengths = [self.layout(line)[1] / 64.0 for line in text_lines]
+        max_length = max(lengths)
+        top = xy[1] - (len(text_lines) - 1) * self.line_spacing / 2.0
+        for line, length in zip(text_lines, lengths):
+            width_difference = max_length - length
+            left = xy[0] - width_difference / 2.0
+            if align == "center":
+                left += width_difference / 2.0
+            elif align == "right":
+                left += width_difference
+            self.draw_line(bitmap, line, (left, top))
+            top += self.line_spacing
+
+
+@lru_cache(maxsize=16)
+def get_glyph_atlas(font: ImageFont.FreeTypeFont) -> GlyphAtlas:
+    """Return the glyph atlas of a font, sharing it between all renders.
+
+    Fonts loaded with get_font are shared, so their atlases are shared as well.
+    """
+    return GlyphAtlas(font)
@@ -0,0 +1,150 @@
+"""A packed 1-bit label bitmap in the row order of the printer.
+
+PIL stores mode "1" images with one byte per pixel. A label raster packs 8 pixels
+per byte instead, in the layout which is sent to the printer: one row per column of
+the label, starting at the left edge, where each row spans the tape from its bottom
+edge to its top edge. Rows are padded to whole bytes.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+
+from PIL import Image
+
+
+class LabelRaster:
+    """The packed rows of a label, backed by a single bytearray."""
+
+    __slots__ = ("data", "height_px", "row_bytes")
+
+    data: bytearray
+    height_px: int
+    """Number of pixels across the tape, i.e. the height of the label bitmap."""
+    row_bytes: int
+    """Number of bytes of each row."""
+
+    def __init__(self, height_px: int, data: bytes | bytearray = b"") -> None:
+        self.height_px = height_px
+        self.row_bytes = (height_px + 7) // 8
+        if self.row_bytes == 0 or len(data) % self.row_bytes:
+            raise ValueError(
+                f"{len(data)} bytes don't make up rows of {height_px} pixels"
+            )
+        self.data = bytearray(data)
+
+    @classmethod
+    def blank(cls, width_px: int, height_px: int) -> LabelRaster:
+        return cls(height_px, bytes(width_px * ((height_px + 7) // 8)))
+
+    @classmethod
+    def from_image(cls, bitmap: Image.Image) -> LabelRaster:
+        """Pack a label bitmap in mode "1" where pixels equal to 1 are burned."""
+        # Rotating by 270 degrees makes rows span the width of the tape, with the
+        # first row corresponding to the left edge of the label. PIL packs mode "1"
+        # images with 8 pixels per byte.
+        return cls(bitmap.height, bitmap.transpose(Image.ROTATE_270).tobytes())
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[bytes], height_px: int) -> LabelRaster:
+        return cls(height_px, b"".join(rows))
+
+    @classmethod
+    def hconcat(
+        cls, rasters: Iterable[LabelRaster], padding_px: int = 0
+    ) -> LabelRaster:
+        """Place rasters of the same height next to each other.
+
+        The rasters are separated by padding_px blank rows.
+        """
+        rasters = list(rasters)
+        if not rasters:
+            raise ValueError("No rasters to concatenate")
+        height_px = rasters[0].height_px
+        if any(r.height_px != height_px for r in rasters):
+            raise ValueError("Only rasters of the same height can be concatenated")
+        padding = bytes(padding_px * rasters[0].row_bytes)
+        return cls(height_px, padding.join(r.data for r in rasters))
+
+    def to_image(self) -> Image.Image:
+        """Unpack the raster into a label bitmap in mode "1"."""
+        if not self.data:
+            return Image.new("1", (0, self.height_px))
+        rotated = Image.frombytes(
+            "1", (self.row_bytes * 8, self.width_px), bytes(self.data)
+        )
+        rotated = rotated.crop((0, 0, self.height_px, self.width_px))
+        return rotated.transpose(Image.ROTATE_90)
+
+    @property
+    def width_px(self) -> int:
+        """Number of rows, i.e. the length of the label in pixels."""
+        return len(self.data) // self.row_bytes
+
+    def __len__(self) -> int:
+        return self.width_px
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, LabelRaster):
+            return NotImplemented
+        return self.height_px == other.height_px and self.data == other.data
+
+    def __repr__(self) -> str:
+        return f"LabelRaster(width_px={self.width_px}, height_px={self.height_px})"
+
+    def __getitem__(self, index: slice) -> LabelRaster:
+        """Return the rows in a slice as a new raster."""
+        if not isinstance(index, slice):
+            raise TypeError("Rasters can only be sliced, use row() for single rows")
+        start, stop, step = index.indices(self.width_px)
+        if step != 1:
+            raise ValueError("Rasters can't be sliced with a step")
+        return LabelRaster(
+            self.height_px,
+            self.data[start * self.row_bytes : max(start, stop) * self.row_bytes],
+        )
+
+    def row(self, index: int) -> bytes:
+        if not -self.width_px <= index < self.width_px:
+            raise IndexError("Row index out of range")
+        start = (index % self.width_px) * self.row_bytes
+        return bytes(self.data[start : start + self.row_bytes])
+
+    def rows(self) -> list[bytes]:
+        """Split the raster into rows, as sent to the printer."""
+        view = memoryview(self.data)
+        return [
+            view[i : i + self.row_bytes].tobytes()
+            for i in range(0, len(view), self.row_bytes)
+        ]
+
+    def tobytes(self) -> bytes:
+        return bytes(self.data)
+
+    def blank_runs(self, min_length: int = 1) -> Iterator[tuple[int, int]]:
+        """Yield (start, stop) of the runs of blank rows which are long enough."""
+        view = memoryview(self.data)
+        blank_row = bytes(self.row_bytes)
+        start = None
+        for i in range(self.width_px + 1):
+            offset = i * self.row_bytes
+            if (
+                i < self.width_px
+                and view[offset : offset + self.row_bytes] == blank_row
+            ):
+                if start is None:
+                    start = i
+                continue
+            if start is not None and i - start >= min_length:
+                yield start, i
+            start = None
+
+    def strip(self) -> LabelRaster:
+        """Return the raster without the blank rows at either end."""
+        runs = list(self.blank_runs())
+        start, stop = 0, self.width_px
+        if runs and runs[0][0] == 0:
+            start = runs[0][1]
+        if runs and runs[-1][1] == self.width_px:
+            stop = max(start, runs[-1][0])
+        return self[start:stop]
@@ -0,0 +1,208 @@
+"""A plain description of a label, which can be rendered in any process."""
+
+from __future__ import annotations
+
+import textwrap
+from typing import NamedTuple, Sequence
+
+from PIL import Image
+
+from dymoprint.lib.dymo_print_engines import DymoRenderEngine
+from dymoprint.lib.profiling import Profile, profile_stage
+
+
+class LabelSpec(NamedTuple):
+    """Everything needed to render one label, mirroring the CLI options.
+
+    The segments are laid out from left to right in the same order as in the CLI:
+    test pattern, QR code or barcode, text, picture.
+    """
+
+    text_lines: Sequence[str] = ()
+    font_file_name: str | None = None
+    frame_width_px: int | None = None
+    font_size_ratio: float = 0.9
+    align: str = "left"
+    qr: str | None = None
+    barcode: str | None = None
+    barcode_type: str | None = None
+    barcode_with_text: bool = False
+    picture: str | None = None
+    test_pattern: int = 0
+    min_payload_len_px: int = 0
+    max_payload_len_px: int | None = None
+    justify: str = "center"
+    auto_fit: str | None = None
+    """With "size", the font size of the text is chosen as large as possible up to
+    font_size_ratio such that the label fits max_payload_len_px. With "wrap", the
+    text may also be rewrapped into a different number of lines."""
+
+
+# Maximum number of lines which auto-fit wraps the text into
+_MAX_WRAP_LINES = 6
+
+
+def estimate_label_spec_width(render_engine: DymoRenderEngine, spec: LabelSpec) -> int:
+    """Compute the payload width of a label spec without rendering it."""
+    return render_engine.estimate_width(
+        _estimate_segment_widths(render_engine, spec),
+        min_payload_len_px=spec.min_payload_len_px,
+    )
+
+
+def _estimate_segment_widths(
+    render_engine: DymoRenderEngine, spec: LabelSpec
+) -> list[int]:
+    widths = []
+
+    if spec.test_pattern:
+        widths.append(render_engine.estimate_test_width(spec.test_pattern))
+
+    if spec.qr is not None:
+        widths.append(render_engine.estimate_qr_width(spec.qr))
+
+    elif spec.barcode is not None:
+        assert spec.barcode_type is not None
+        widths.append(
+            render_engine.estimate_barcode_width(spec.barcode, spec.barcode_type)
+        )
+
+    if spec.text_lines:
+        assert spec.font_file_name is not None
+        widths.append(
+            render_engine.estimate_text_width(
+                text_lines=list(spec.text_lines),
+                font_file_name=spec.font_file_name,
+                frame_width_px=spec.frame_width_px,
+                font_size_ratio=spec.font_size_ratio,
+            )
+        )
+
+    if spec.picture:
+        widths.append(render_engine.estimate_picture_width(spec.picture))
+
+    return widths
+
+
+def _wrap_candidates(text_lines: Sequence[str], wrap: bool) -> list[list[str]]:
+    """List the ways to break the text into lines which auto-fit tries."""
+    candidates = [list(text_lines)]
+    if not wrap:
+        return candidates
+    words = " ".join(text_lines).split()
+    for num_lines in range(1, min(len(words), _MAX_WRAP_LINES) + 1):
+        # Aim for lines of similar length, then take the narrowest wrapping which
+        # doesn't need more lines.
+        width = max(len(" ".join(words)) // num_lines, max(len(w) for w in words))
+        while len(lines := textwrap.wrap(" ".join(words), width)) > num_lines:
+            width += 1
+        if lines not in candidates:
+            candidates.append(lines)
+    return candidates
+
+
+def fit_label_spec(render_engine: DymoRenderEngine, spec: LabelSpec) -> LabelSpec:
+    """Choose the largest font size with which the label fits its maximum length.
+
+    The search uses font metrics only, so fitting costs about as much as one
+    render. If the text doesn't fit at any size, the spec is returned unchanged.
+    """
+    if spec.max_payload_len_px is None or not spec.text_lines:
+        return spec
+    assert spec.font_file_name is not None
+    other_widths = _estimate_segment_widths(render_engine, spec._replace(text_lines=()))
+    padding = 4
+    text_width_px = spec.max_payload_len_px - sum(
+        width + padding for width in other_widths
+    )
+
+    best = None
+    for text_lines in _wrap_candidates(spec.text_lines, spec.auto_fit == "wrap"):
+        fit = render_engine.fit_text_size(
+            text_lines=text_lines,
+            font_file_name=spec.font_file_name,
+            max_width_px=text_width_px,
+            frame_width_px=spec.frame_width_px,
+            max_font_size_ratio=spec.font_size_ratio,
+        )
+        if fit is not None and (best is None or fit[0] > best[0]):
+            best = (fit[0], fit[1], text_lines)
+    if best is None:
+        return spec
+    _, font_size_ratio, text_lines = best
+    return spec._replace(text_lines=text_lines, font_size_ratio=font_size_ratio)
+
+
+def render_label_spec(
+    render_engine: DymoRenderEngine, spec: LabelSpec, profile: Profile | None = None
+) -> Image.Image:
+    """Render all the segments of a label spec and merge them into one bitmap.
+
+    If the spec has a maximum length, its width is estimated first, so that labels
+    which are too long fail before anything is drawn. If a profile is given, the
+    stages are timed in it.
+    """
+    with profile_stage(profile, "layout"):
+        if spec.auto_fit is not None:
+            spec = fit_label_spec(render_engine, spec)
+        if spec.max_payload_len_px is not None:
+            render_engine.check_payload_len(
+                estimate_label_spec_width(render_engine, spec), spec.max_payload_len_px
+            )
+
+    with profile_stage(profile, "render"):
+        bitmaps = _render_segments(render_engine, spec)
+
+    with profile_stage(profile, "merge"):
+        return render_engine.merge_render(
+            bitmaps=bitmaps,
+            min_payload_len_px=spec.min_payload_len_px,
+            max_payload_len_px=spec.max_payload_len_px,
+            justify=spec.justify,
+        )
+
+
+def _render_segments(
+    render_engine: DymoRenderEngine, spec: LabelSpec
+) -> list[Image.Image]:
+    bitmaps = []
+
+    if spec.test_pattern:
+        bitmaps.append(render_engine.render_test(spec.test_pattern))
+
+    if spec.qr is not None:
+        bitmaps.append(render_engine.render_qr(spec.qr))
+
+    elif spec.barcode is not None:
+        assert spec.barcode_type is not None
+        if spec.barcode_with_text:
+            assert spec.font_file_name is not None
+            bitmaps.append(
+                render_engine.render_barcode_with_text(
+                    spec.barcode,
+                    spec.barcode_type,
+                    spec.font_file_name,
+                    spec.frame_width_px,
+                )
+            )
+        else:
+            bitmaps.append(
+                render_engine.render_barcode(spec.barcode, spec.barcode_type)
+            )
+
+    if spec.text_lines:
+        assert spec.font_file_name is not None
+        bitmaps.append(
+            render_engine.render_text(
+                text_lines=list(spec.text_lines),
+                font_file_name=spec.font_file_name,
+                frame_width_px=spec.frame_width_px,
+                font_size_ratio=spec.font_size_ratio,
+                align=spec.align,
+            )
+        )
+
+    if spec.picture:
+        bitmaps.append(render_engine.render_picture(spec.picture))
+
+    return bitmaps
@@ -0,0 +1,201 @@
+"""Label layouts which are compiled once and rendered for many records.
+
+A template is a list of segments, in the order in which they appear on the label.
+Segment values may contain ``str.format`` fields such as ``"Asset {serial}"``.
+Segments without fields are static: they are rendered once when the template is
+compiled. Segments with fields are variable: their fonts and geometry are resolved
+once, and only the rasterization is repeated for each record.
+"""
+
+from __future__ import annotations
+
+from _string import formatter_field_name_split
+from string import Formatter
+from typing import Any, Callable, Mapping, NamedTuple, Union
+
+from PIL import Image
+
+from dymoprint.lib.dymo_print_engines import DymoRenderEngine, get_font
+
+
+class TextSegment(NamedTuple):
+    text_lines: list[str]
+    font_file_name: str
+    frame_width_px: int = 0
+    font_size_ratio: float = 0.9
+    align: str = "left"
+
+
+class QrSegment(NamedTuple):
+    text: str
+
+
+class BarcodeSegment(NamedTuple):
+    text: str
+    bar_code_type: str
+    font_file_name: str | None = None
+    """When set, the barcode text is printed below the barcode with this font."""
+    frame_width_px: int = 0
+    font_size_ratio: float = 0.9
+    align: str = "center"
+
+
+class PictureSegment(NamedTuple):
+    picture_path: str
+
+
+TemplateSegment = Union[TextSegment, QrSegment, BarcodeSegment, PictureSegment]
+
+
+def template_fields(value: str | list[str]) -> set[str]:
+    """Return the record keys used by the format fields in a segment value.
+
+    The key of a field like ``{serial.upper}`` or ``{serial[0]}`` is ``serial``.
+    Positional fields like ``{}`` or ``{0}`` are rejected with ValueError, since
+    records are mappings.
+    """
+    values = [value] if isinstance(value, str) else value
+    fields = set()
+    for v in values:
+        for _, field_name, _, _ in Formatter().parse(v):
+            if field_name is None:
+                continue
+            key, _ = formatter_field_name_split(field_name)
+            if not isinstance(key, str) or not key:
+                raise ValueError(
+                    f"Template fields must be named, got {{{field_name}}} in {v!r}"
+                )
+            fields.add(key)
+    return fields
+
+
+def _segment_fields(segment: TemplateSegment) -> set[str]:
+    if isinstance(segment, TextSegment):
+        return template_fields(segment.text_lines)
+    if isinstance(segment, PictureSegment):
+        return template_fields(segment.picture_path)
+    return template_fields(segment.text)
+
+
+class LabelTemplate:
+    """A label layout which is compiled once and rendered for many records.
+
+    Args:
+    ----
+        render_engine (DymoRenderEngine): The render engine to use.
+        segments (list): The segments of the label, from left to right.
+        min_payload_len_px (int): Minimum payload length, as in merge_render.
+        max_payload_len_px (int): Maximum payload length, as in merge_render.
+        justify (str): Justification of the payload, as in merge_render.
+    """
+
+    fields: frozenset[str]
+    """Names of all the record fields used by the template."""
+
+    def __init__(
+        self,
+        render_engine: DymoRenderEngine,
+        segments: list[TemplateSegment],
+        *,
+        min_payload_len_px: int = 0,
+        max_payload_len_px: int | None = None,
+        justify: str = "center",
+    ) -> None:
+        self.render_engine = render_engine
+        self.min_payload_len_px = min_payload_len_px
+        self.max_payload_len_px = max_payload_len_px
+        self.justify = justify
+        self._renderers: list[Image.Image | Callable[[Mapping[str, Any]], Any]] = [
+            self._compile_segment(segment) for segment in segments
+        ]
+        self.fields = frozenset().union(*(_segment_fields(s) for s in segments))
+
+    def _compile_segment(
+        self, segment: TemplateSegment
+    ) -> Image.Image | Callable[[Mapping[str, Any]], Image.Image]:
+        """Pre-render a static segment, or prepare the renderer of a variable one."""
+        engine = self.render_engine
+        is_static = not _segment_fields(segment)
+
+        if isinstance(segment, TextSegment):
+            text_lines = segment.text_lines or [" "]
+            geometry = engine.text_geometry(
+                num_lines=len(text_lines),
+                frame_width_px=segment.frame_width_px,
+                font_size_ratio=segment.font_size_ratio,
+            )
+            font = get_font(str(segment.font_file_name), geometry.font_size_px)
+
+            def render_text(record: Mapping[str, Any]) -> Image.Image:
+                return engine.draw_text(
+                    text_lines=[line.format_map(record) for line in text_lines],
+                    font=font,
+                    geometry=geometry,
+                    align=segment.align,
+                )
+
+            renderer = render_text
+
+        elif isinstance(segment, QrSegment):
+
+            def render_qr(record: Mapping[str, Any]) -> Image.Image:
+                return engine.render_qr(segment.text.format_map(record))
+
+            renderer = render_qr
+
+        elif isinstance(segment, BarcodeSegment):
+
+            def render_barcode(record: Mapping[str, Any]) -> Image.Image:
+                text = segment.text.format_map(record)
+                if segment.font_file_name is None:
+                    return engine.render_barcode(text, segment.bar_code_type)
+                return engine.render_barcode_with_text(
+                    text,
+                    segment.bar_code_type,
+                    segment.font_file_name,
+                    segment.frame_width_px,
+                    font_size_ratio=segment.font_size_ratio,
+                    align=segment.align,
+                )
+
+            renderer = render_barcode
+
+        elif isinstance(segment, PictureSegment):
+
+            def render_picture(record: Mapping[str, Any]) -> Image.Image:
+                return engine.render_picture(segment.picture_path.format_map(record))
+
+            renderer = render_picture
+
+        else:
+            raise TypeError(f"Unknown template segment: {segment!r}")
+
+        if is_static:
+            return renderer({})
+        return renderer
+
+    def render(self, record: Mapping[str, Any] | None = None) -> Image.Image:
+        """Render the label for a single record.
+
+        Only the variable segments are rasterized. The pre-rendered static segments
+        are pasted into place by merge_render.
+        """
+        if record is None:
+            record = {}
+        missing = self.fields - record.keys()
+        if missing:
+            raise KeyError(f"Record is missing fields: {', '.join(sorted(missing))}")
+        bitmaps = [
+            renderer if isinstance(renderer, Image.Image) else renderer(record)
+            for renderer in self._renderers
+        ]
+        label_bitmap = self.render_engine.merge_render(
+            bitmaps=bitmaps,
+            min_payload_len_px=self.min_payload_len_px,
+            max_payload_len_px=self.max_payload_len_px,
+            justify=self.justify,
+        )
+        if any(label_bitmap is renderer for renderer in self._renderers):
+            # Never hand out the pre-rendered bitmap, since callers may modify it.
+            label_bitmap = label_bitmap.copy()
+        return label_bitmap
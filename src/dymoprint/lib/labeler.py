@@ -5,12 +5,26 @@
 # permitted in any medium without royalty provided the copyright notice and
 # this notice are preserved.
 # === END LICENSE STATEMENT ===
+from __future__ import annotations
+
 import array
-from typing import List, Optional
+import math
+from typing import TYPE_CHECKING, Sequence
+
+from .constants import (
+    DEFAULT_MARGIN_PX,
+    DEFAULT_MAX_LINES,
+    ESC,
+    PIXELS_PER_MM,
+    SYN,
+    PrinterModel,
+)
 
-import usb
+if TYPE_CHECKING:
+    import usb
 
-from .constants import DEFAULT_MARGIN_PX, ESC, SYN
+# The default timeout of pyusb
+USB_TIMEOUT_MS = 1000
 
 
 class DymoLabeler:
@@ -40,21 +54,57 @@ class DymoLabeler:
     # 110] Connection timed out" with long labels. Using dev.default_timeout
     # (1000) and the transfer speeds available in the descriptors somewhere, a
     # sensible timeout can also be calculated dynamically.
-    synwait: Optional[int]
+    synwait: int | None
+    # Timeout of the status requests between the chunks, which is long enough for
+    # the printer to print a chunk if its print speed is known
+    status_timeout_ms: int | None
     devout: usb.core.Endpoint
     devin: usb.core.Endpoint
 
-    def __init__(self, devout, devin, synwait=None, tape_size_mm=12):
-        """Initialize the LabelManager object (HLF)."""
+    # Counters of the traffic with the printer, for profiling
+    num_bytes_sent: int
+    num_chunks_sent: int
+    num_status_reads: int
+
+    def __init__(
+        self,
+        devout,
+        devin,
+        synwait=None,
+        tape_size_mm=12,
+        max_lines=None,
+        model: PrinterModel | None = None,
+    ):
+        """Initialize the LabelManager object (HLF).
+
+        The transfer parameters which aren't given are taken from the printer model,
+        if there is one.
+        """
         self.tape_size_mm = tape_size_mm
-        self.cmd: List[int] = []
+        self.lineBytes = self.max_bytes_per_line(tape_size_mm)
+        self.status_timeout_ms = None
+        if model is not None:
+            self.lineBytes = min(self.lineBytes, model.bytes_per_line)
+            if synwait is None:
+                synwait = model.synwait
+            if max_lines is None:
+                max_lines = model.max_lines
+            if model.print_speed_mm_s is not None:
+                chunk_ms = 1000 * synwait / PIXELS_PER_MM / model.print_speed_mm_s
+                self.status_timeout_ms = max(USB_TIMEOUT_MS, math.ceil(2 * chunk_ms))
+        if max_lines is None:
+            max_lines = DEFAULT_MAX_LINES
+        self.cmd: list[int] = []
         self.response = False
-        self.bytesPerLine_ = None
+        self.bytesPerLine_: int | None = None
         self.dotTab_ = 0
-        self.maxLines = 200
+        self.maxLines = max_lines
         self.devout = devout
         self.devin = devin
         self.synwait = synwait
+        self.num_bytes_sent = 0
+        self.num_chunks_sent = 0
+        self.num_status_reads = 0
 
     def sendCommand(self):
         """Send the already built command to the LabelManager (MLF)."""
@@ -69,7 +119,9 @@ class DymoLabeler:
                 # Send a status request
                 cmdBin = array.array("B", [ESC, ord("A")])
                 cmdBin.tofile(self.devout)
-                rspBin = self.devin.read(8)
+                rspBin = self.devin.read(8, self.status_timeout_ms)
+                self.num_bytes_sent += len(cmdBin)
+                self.num_status_reads += 1
                 _ = array.array("B", rspBin).tolist()
                 # Ok, we got a response. Now we can send a chunk of data
 
@@ -95,12 +147,15 @@ class DymoLabeler:
             # Send the chunk
             cmdBin = array.array("B", cmd_to_send)
             cmdBin.tofile(self.devout)
+            self.num_bytes_sent += len(cmdBin)
+            self.num_chunks_sent += 1
 
         self.cmd = []  # This looks redundant.
         if not self.response:
             return None
         self.response = False
         responseBin = self.devin.read(8)
+        self.num_status_reads += 1
         response = array.array("B", responseBin).tolist()
         return response
 
@@ -121,7 +176,7 @@ class DymoLabeler:
 
     def dotTab(self, value):
         """Set the bias text height, in bytes (MLF)."""
-        if value < 0 or value > self.max_bytes_per_line(self.tape_size_mm):
+        if value < 0 or value > self.lineBytes:
             raise ValueError
         cmd = [ESC, ord("B"), value]
         self.buildCommand(cmd)
@@ -157,8 +212,8 @@ class DymoLabeler:
     def chainMark(self):
         """Set Chain Mark (MLF)."""
         self.dotTab(0)
-        self.bytesPerLine(self.max_bytes_per_line(self.tape_size_mm))
-        self.line([0x99] * self.max_bytes_per_line(self.tape_size_mm))
+        self.bytesPerLine(self.lineBytes)
+        self.line([0x99] * self.lineBytes)
 
     def skipLines(self, value):
         """Set number of lines of white to print (MLF)."""
@@ -185,18 +240,33 @@ class DymoLabeler:
         response = self.sendCommand()
         print(response)
 
-    def printLabel(self, lines: List[List[int]], margin_px=DEFAULT_MARGIN_PX):
+    def checkLineWidth(self, lines: list[Sequence[int]]):
+        """Refuse lines which are wider than the print head (HLF).
+
+        The lines are checked before anything is sent, so that no partial label is
+        printed.
+        """
+        width = max((len(line) for line in lines), default=0)
+        if width > self.lineBytes:
+            raise ValueError(
+                f"Lines of {width} bytes are wider than the {self.lineBytes} bytes "
+                "which the printer can print"
+            )
+
+    def printLabel(self, lines: list[Sequence[int]], margin_px=DEFAULT_MARGIN_PX):
         """Print the label described by lines.
 
         Automatically split the label if it's larger than maxLines.
         """
+        self.checkLineWidth(lines)
         while len(lines) > self.maxLines + 1:
             self.rawPrintLabel(lines[0 : self.maxLines], margin_px=0)
             del lines[0 : self.maxLines]
         self.rawPrintLabel(lines, margin_px=margin_px)
 
-    def rawPrintLabel(self, lines: List[List[int]], margin_px=DEFAULT_MARGIN_PX):
+    def rawPrintLabel(self, lines: list[Sequence[int]], margin_px=DEFAULT_MARGIN_PX):
         """Print the label described by lines (HLF)."""
+        self.checkLineWidth(lines)
         # Here used to be a matrix optimization code that caused problems in issue #87
         self.tapeColor(0)
         for line in lines:
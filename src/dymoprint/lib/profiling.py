@@ -0,0 +1,71 @@
+"""Timing of the stages of printing a label.
+
+Functions which take a profile time their stages with profile_stage(), which does
+nothing if no profile is given, so profiling costs nothing unless it's asked for.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import time
+from typing import ContextManager, Iterator
+
+
+class Profile:
+    """The time spent in each stage of a run, and counters of what was done."""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, float] = {}
+        """Seconds spent in each stage, in the order in which the stages started."""
+        self.counters: dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a stage. The times of stages which run several times add up."""
+        self.stages.setdefault(name, 0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.stages.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": {name: round(s, 6) for name, s in self.stages.items()},
+            "total": round(self.total_seconds, 6),
+            "counters": dict(self.counters),
+        }
+
+    def format_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def format_table(self) -> str:
+        """Format the stages and counters as an aligned plain-text table."""
+        total = self.total_seconds
+        rows = [
+            (name, f"{1000 * seconds:.1f} ms", f"{100 * seconds / total:.0f}%")
+            for name, seconds in self.stages.items()
+            if total > 0
+        ]
+        rows.append(("total", f"{1000 * total:.1f} ms", ""))
+        rows.extend((name, str(n), "") for name, n in self.counters.items())
+        widths = [max(len(row[i]) for row in rows) for i in range(3)]
+        return "\n".join(
+            f"{name:<{widths[0]}}  {value:>{widths[1]}}  {share:>{widths[2]}}".rstrip()
+            for name, value, share in rows
+        )
+
+
+def profile_stage(profile: Profile | None, name: str) -> ContextManager[None]:
+    """Time a stage in the profile, if there is one."""
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.stage(name)
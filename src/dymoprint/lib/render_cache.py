@@ -0,0 +1,152 @@
+"""Memoization of the segments rendered by DymoRenderEngine."""
+
+from __future__ import annotations
+
+import functools
+import inspect
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, TypeVar
+
+from PIL import Image
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+F = TypeVar("F", bound=Callable[..., Image.Image])
+
+
+def _hashable(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, Path):
+        return str(value)
+    return value
+
+
+def file_stamp(path: str) -> tuple[int, int] | None:
+    """Return the modification time and size of a file, or None if it's missing."""
+    try:
+        stat = Path(path).stat()
+    except (OSError, ValueError):
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class RenderCache:
+    """A size-bounded cache of rendered segment bitmaps.
+
+    Bitmaps are evicted in least-recently-used order once their total size exceeds
+    max_bytes. The cached bitmaps are never handed out: every call returns a copy,
+    so callers may modify the bitmaps they get without affecting the cache.
+
+    A single cache may be shared by several render engines, since the keys include
+    the label height and the text backend of the engine.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, Image.Image] = OrderedDict()
+        self._num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Image.Image | None:
+        bitmap = self._entries.get(key)
+        if bitmap is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return bitmap.copy()
+
+    def put(self, key: Hashable, bitmap: Image.Image) -> None:
+        size = _bitmap_bytes(bitmap)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._num_bytes -= _bitmap_bytes(self._entries.pop(key))
+        self._entries[key] = bitmap.copy()
+        self._num_bytes += size
+        self._evict()
+
+    def resize(self, max_bytes: int) -> None:
+        """Change the size limit, evicting bitmaps if the cache is too large now."""
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._num_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._num_bytes -= _bitmap_bytes(evicted)
+
+    def invalidate(self, picture_path: str | Path | None = None) -> None:
+        """Drop the cached renders of a picture, or of everything if no path is given.
+
+        Pictures which change on disk are re-rendered anyway, since their
+        modification time is part of the key. This is for changes which keep the
+        modification time, or for freeing memory.
+        """
+        if picture_path is None:
+            self._entries.clear()
+            self._num_bytes = 0
+            return
+        path = str(picture_path)
+        for key in [k for k in self._entries if _is_picture_key(k, path)]:
+            self._num_bytes -= _bitmap_bytes(self._entries.pop(key))
+
+
+def _bitmap_bytes(bitmap: Image.Image) -> int:
+    # Mode "1" images are stored with one byte per pixel
+    return bitmap.width * bitmap.height
+
+
+def _is_picture_key(key: Hashable, path: str) -> bool:
+    assert isinstance(key, tuple)
+    name, _, _, arguments, _ = key
+    return name == "render_picture" and dict(arguments).get("picture_path") == path
+
+
+def memoized(*, file_args: tuple[str, ...] = ()) -> Callable[[F], F]:
+    """Memoize a render method of DymoRenderEngine in its render_cache, if any.
+
+    The key consists of the method name, the label height and the text backend of
+    the engine, and all the arguments with their defaults applied. For arguments
+    which are named in file_args, the modification time and size of the file are
+    part of the key as well.
+    """
+
+    def decorator(method: F) -> F:
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache: RenderCache | None = self.render_cache
+            if cache is None:
+                return method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = tuple(
+                (name, _hashable(value))
+                for name, value in bound.arguments.items()
+                if name != "self"
+            )
+            stamps = tuple(file_stamp(bound.arguments[name]) for name in file_args)
+            key = (
+                method.__name__,
+                self.label_height_px,
+                self.text_backend,
+                arguments,
+                stamps,
+            )
+            bitmap = cache.get(key)
+            if bitmap is None:
+                bitmap = method(self, *args, **kwargs)
+                cache.put(key, bitmap)
+            return bitmap
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
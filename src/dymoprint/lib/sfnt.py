@@ -0,0 +1,224 @@
+"""Read metadata from the tables of TrueType and OpenType font files.
+
+Only the few tables which are needed to index fonts are parsed, and only the
+bytes of those tables are read from disk. For font collections (.ttc), the first
+font of the collection is read, which is the one that PIL loads by default.
+
+See <https://learn.microsoft.com/en-us/typography/opentype/spec/otff>.
+"""
+
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from typing import BinaryIO, Dict, NamedTuple, Tuple
+
+TableDirectory = Dict[bytes, Tuple[int, int]]
+"""The offset and length of each table, by tag."""
+
+_NAME_FAMILY = 1
+_NAME_SUBFAMILY = 2
+_NAME_FULL_NAME = 4
+_NAME_TYPOGRAPHIC_FAMILY = 16
+_NAME_TYPOGRAPHIC_SUBFAMILY = 17
+
+_PLATFORM_UNICODE = 0
+_PLATFORM_MACINTOSH = 1
+_PLATFORM_WINDOWS = 3
+_LANGUAGE_WINDOWS_EN_US = 0x409
+
+
+class FontNames(NamedTuple):
+    family: str
+    subfamily: str
+    """The style within the family, for example "Bold Italic"."""
+    full_name: str
+    weight: int
+    """From 100 (thin) to 900 (black), where 400 is regular and 700 is bold."""
+    width: int
+    """From 1 (ultra-condensed) to 9 (ultra-expanded), where 5 is normal."""
+    italic: bool
+
+
+def _unpack(fmt: str, data: bytes, offset: int = 0) -> tuple:
+    try:
+        return struct.unpack_from(fmt, data, offset)
+    except struct.error as e:
+        raise ValueError(f"Truncated font table: {e}") from None
+
+
+def _read_exactly(f: BinaryIO, offset: int, length: int) -> bytes:
+    f.seek(offset)
+    data = f.read(length)
+    if len(data) != length:
+        raise ValueError("Font file is truncated")
+    return data
+
+
+def read_table_directory(f: BinaryIO) -> TableDirectory:
+    offset = 0
+    (tag,) = _unpack(">4s", _read_exactly(f, 0, 4))
+    if tag == b"ttcf":
+        (offset,) = _unpack(">L", _read_exactly(f, 12, 4))
+        (tag,) = _unpack(">4s", _read_exactly(f, offset, 4))
+    if tag not in (b"\x00\x01\x00\x00", b"OTTO", b"true"):
+        raise ValueError("Not a TrueType or OpenType font")
+    (num_tables,) = _unpack(">H", _read_exactly(f, offset + 4, 2))
+    records = _read_exactly(f, offset + 12, 16 * num_tables)
+    directory = {}
+    for i in range(num_tables):
+        tag, _, table_offset, length = _unpack(">4sLLL", records, 16 * i)
+        directory[tag] = (table_offset, length)
+    return directory
+
+
+def read_table(f: BinaryIO, directory: TableDirectory, tag: bytes) -> bytes | None:
+    if tag not in directory:
+        return None
+    return _read_exactly(f, *directory[tag])
+
+
+def _decode_name(platform_id: int, data: bytes) -> str:
+    if platform_id == _PLATFORM_MACINTOSH:
+        return data.decode("mac_roman")
+    return data.decode("utf-16-be", errors="replace")
+
+
+def _parse_names(data: bytes) -> dict[int, str]:
+    """Return the strings of the name table by name ID, preferring English."""
+    _, count, string_offset = _unpack(">HHH", data)
+    names: dict[int, tuple[int, str]] = {}
+    for i in range(count):
+        platform_id, encoding_id, language_id, name_id, length, offset = _unpack(
+            ">HHHHHH", data, 6 + 12 * i
+        )
+        if platform_id == _PLATFORM_WINDOWS and encoding_id in (0, 1, 10):
+            rank = 0 if language_id == _LANGUAGE_WINDOWS_EN_US else 2
+        elif platform_id == _PLATFORM_UNICODE:
+            rank = 1
+        elif platform_id == _PLATFORM_MACINTOSH and encoding_id == 0:
+            rank = 3 if language_id == 0 else 4
+        else:
+            continue
+        if name_id in names and names[name_id][0] <= rank:
+            continue
+        start = string_offset + offset
+        string = data[start : start + length]
+        names[name_id] = (rank, _decode_name(platform_id, string))
+    return {name_id: string for name_id, (_, string) in names.items()}
+
+
+def read_font_names(path: str | Path) -> FontNames:
+    """Read the names, weight, width and slant of a font.
+
+    Raises ValueError if the file is not a readable TrueType or OpenType font.
+    """
+    with Path(path).open("rb") as f:
+        directory = read_table_directory(f)
+        name_table = read_table(f, directory, b"name")
+        os2_table = read_table(f, directory, b"OS/2")
+
+    names = _parse_names(name_table) if name_table else {}
+    family = names.get(_NAME_TYPOGRAPHIC_FAMILY) or names.get(_NAME_FAMILY, "")
+    subfamily = (
+        names.get(_NAME_TYPOGRAPHIC_SUBFAMILY)
+        or names.get(_NAME_SUBFAMILY)
+        or "Regular"
+    )
+    full_name = names.get(_NAME_FULL_NAME) or f"{family} {subfamily}"
+
+    if os2_table is not None:
+        weight, width = _unpack(">HH", os2_table, 4)
+        (fs_selection,) = _unpack(">H", os2_table, 62)
+        italic = bool(fs_selection & 1)
+    else:
+        style = subfamily.lower()
+        weight = 700 if "bold" in style else 400
+        width = 5
+        italic = "italic" in style or "oblique" in style
+    return FontNames(family, subfamily, full_name, weight, width, italic)
+
+
+# cmap subtables by preference, as (platform ID, encoding ID)
+_CMAP_SUBTABLES = [
+    (_PLATFORM_WINDOWS, 10),
+    (_PLATFORM_UNICODE, 6),
+    (_PLATFORM_UNICODE, 4),
+    (_PLATFORM_WINDOWS, 1),
+    (_PLATFORM_UNICODE, 3),
+    (_PLATFORM_UNICODE, 2),
+    (_PLATFORM_UNICODE, 1),
+    (_PLATFORM_UNICODE, 0),
+]
+
+
+def _cmap_format_4_ranges(data: bytes, offset: int) -> list[tuple[int, int]]:
+    (seg_count_x2,) = _unpack(">H", data, offset + 6)
+    seg_count = seg_count_x2 // 2
+    end_codes = offset + 14
+    start_codes = end_codes + seg_count_x2 + 2
+    id_deltas = start_codes + seg_count_x2
+    id_range_offsets = id_deltas + seg_count_x2
+    ranges = []
+    for i in range(seg_count):
+        (end,) = _unpack(">H", data, end_codes + 2 * i)
+        (start,) = _unpack(">H", data, start_codes + 2 * i)
+        (id_delta,) = _unpack(">H", data, id_deltas + 2 * i)
+        id_range_offset_pos = id_range_offsets + 2 * i
+        (id_range_offset,) = _unpack(">H", data, id_range_offset_pos)
+        if start > end or start == 0xFFFF:
+            continue
+        if id_range_offset == 0:
+            ranges.append((start, end))
+            continue
+        # The glyphs are looked up in the glyph ID array, and characters which
+        # are mapped to glyph 0 are missing.
+        for char in range(start, end + 1):
+            glyph_pos = id_range_offset_pos + id_range_offset + 2 * (char - start)
+            (glyph,) = _unpack(">H", data, glyph_pos)
+            if glyph != 0 and (glyph + id_delta) & 0xFFFF != 0:
+                ranges.append((char, char))
+    return ranges
+
+
+def _cmap_format_12_ranges(data: bytes, offset: int) -> list[tuple[int, int]]:
+    (num_groups,) = _unpack(">L", data, offset + 12)
+    return [_unpack(">LL", data, offset + 16 + 12 * i) for i in range(num_groups)]
+
+
+def _merge_ranges(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def read_cmap_ranges(path: str | Path) -> list[tuple[int, int]]:
+    """Read the code points which a font has glyphs for, as inclusive ranges.
+
+    Only the Unicode subtables in formats 4 and 12 are supported, which nearly
+    all fonts have. Raises ValueError if the font has none of them.
+    """
+    with Path(path).open("rb") as f:
+        directory = read_table_directory(f)
+        data = read_table(f, directory, b"cmap")
+    if data is None:
+        raise ValueError("Font has no cmap table")
+
+    _, num_subtables = _unpack(">HH", data)
+    subtables: dict[tuple[int, int], tuple[int, int]] = {}
+    for i in range(num_subtables):
+        platform_id, encoding_id, offset = _unpack(">HHL", data, 4 + 8 * i)
+        (subtable_format,) = _unpack(">H", data, offset)
+        if subtable_format in (4, 12):
+            subtables.setdefault((platform_id, encoding_id), (subtable_format, offset))
+    for key in _CMAP_SUBTABLES:
+        if key in subtables:
+            subtable_format, offset = subtables[key]
+            if subtable_format == 4:
+                return _merge_ranges(_cmap_format_4_ranges(data, offset))
+            return _merge_ranges(_cmap_format_12_ranges(data, offset))
+    raise ValueError("Font has no supported Unicode cmap subtable")
@@ -0,0 +1,176 @@
+"""An opt-in log of print jobs, for capacity planning.
+
+When telemetry is enabled in dymoprint.ini, every printed label appends one JSON
+line to the log, with the size of the label, the traffic with the printer and the
+timings of the job. `dymoprint stats` summarizes the log.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import time
+from pathlib import Path
+from typing import IO, Iterable, Iterator, NamedTuple
+
+from platformdirs import user_log_dir
+
+from dymoprint.lib.constants import PIXELS_PER_MM
+
+# The stages of a profile which make up the rendering of a label
+_RENDER_STAGES = ("layout", "render", "merge", "raster")
+
+
+def default_telemetry_log_path() -> Path:
+    return Path(user_log_dir("dymoprint")) / "jobs.jsonl"
+
+
+def _device_names(dev) -> tuple[str | None, str | None]:
+    """Return the vendor and product ID, and the serial number of a USB device.
+
+    Reading the serial number needs a request to the device, which may fail.
+    """
+    if dev is None:
+        return None, None
+    device = f"{dev.idVendor:04x}:{dev.idProduct:04x}"
+    try:
+        serial = dev.serial_number
+    except (ValueError, NotImplementedError, OSError):
+        serial = None
+    return device, serial
+
+
+def job_record(
+    *,
+    dev,
+    tape_size_mm: int,
+    label_px: int,
+    num_bytes: int,
+    num_chunks: int,
+    num_status_reads: int,
+    render_seconds: float | None,
+    transfer_seconds: float,
+    error: str | None = None,
+) -> dict:
+    """Describe a print job as one line of the telemetry log."""
+    device, serial = _device_names(dev)
+    return {
+        "time": round(time.time(), 3),
+        "device": device,
+        "serial": serial,
+        "tape_size_mm": tape_size_mm,
+        "label_px": label_px,
+        "label_mm": round(label_px / PIXELS_PER_MM, 1),
+        "bytes": num_bytes,
+        "chunks": num_chunks,
+        "status_reads": num_status_reads,
+        "render_s": None if render_seconds is None else round(render_seconds, 6),
+        "transfer_s": round(transfer_seconds, 6),
+        "lines_per_s": (
+            round(label_px / transfer_seconds, 1)
+            if transfer_seconds > 0 and error is None
+            else None
+        ),
+        "error": error,
+    }
+
+
+def render_seconds(stages: dict[str, float]) -> float | None:
+    """Sum the rendering stages of a profile, or None if it has none of them."""
+    seconds = [stages[name] for name in _RENDER_STAGES if name in stages]
+    return sum(seconds) if seconds else None
+
+
+def append_record(path: Path, record: dict) -> None:
+    """Append a record to the log, ignoring failures since the log is optional."""
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A single write of a line in append mode doesn't interleave with the
+        # writes of other processes.
+        with path.open("a") as f:
+            f.write(line)
+    except OSError:
+        pass
+
+
+def iter_records(f: IO[str]) -> Iterator[dict]:
+    """Read the records of a log line by line, skipping malformed lines."""
+    for line in f:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            yield record
+
+
+def percentile(sorted_values: list[float], p: float) -> float | None:
+    """Return the p-th percentile of sorted values, using the nearest rank."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class DeviceStats(NamedTuple):
+    device: str
+    """The serial number of the printer, or its USB ID if it has none."""
+    jobs: int
+    errors: int
+    latency_p50_s: float | None
+    """Median of the render and transfer time of a job."""
+    latency_p95_s: float | None
+    lines_per_s: float | None
+    """Printed lines per second of transfer, over all jobs."""
+    bytes_per_s: float | None
+    label_mm: float
+    """Total length of the labels."""
+
+
+def summarize(records: Iterable[dict]) -> list[DeviceStats]:
+    """Summarize the records by printer.
+
+    The records are consumed one at a time, and only the latencies are kept in
+    memory, so that long logs can be summarized.
+    """
+    latencies: dict[str, list[float]] = {}
+    totals: dict[str, dict[str, float]] = {}
+    for record in records:
+        device = record.get("serial") or record.get("device") or "unknown"
+        total = totals.setdefault(
+            device,
+            dict.fromkeys(
+                ("jobs", "errors", "lines", "bytes", "transfer_s", "label_mm"), 0
+            ),
+        )
+        total["jobs"] += 1
+        if record.get("error"):
+            total["errors"] += 1
+            continue
+        transfer_s = record.get("transfer_s") or 0.0
+        total["lines"] += record.get("label_px") or 0
+        total["bytes"] += record.get("bytes") or 0
+        total["transfer_s"] += transfer_s
+        total["label_mm"] += record.get("label_mm") or 0.0
+        latencies.setdefault(device, []).append(
+            (record.get("render_s") or 0.0) + transfer_s
+        )
+
+    stats = []
+    for device, total in totals.items():
+        device_latencies = sorted(latencies.get(device, []))
+        transfer_s = total["transfer_s"]
+        stats.append(
+            DeviceStats(
+                device=device,
+                jobs=int(total["jobs"]),
+                errors=int(total["errors"]),
+                latency_p50_s=percentile(device_latencies, 50),
+                latency_p95_s=percentile(device_latencies, 95),
+                lines_per_s=total["lines"] / transfer_s if transfer_s else None,
+                bytes_per_s=total["bytes"] / transfer_s if transfer_s else None,
+                label_mm=total["label_mm"],
+            )
+        )
+    return stats
@@ -1,5 +1,12 @@
+from __future__ import annotations
+
+import codecs
+import sys
+from typing import Iterator, TextIO
+
+from PIL import Image as PILImage
+from PIL import ImageChops
 from PIL.Image import Image
-from PIL.ImageOps import pad
 
 UH = "▀"
 LH = "▄"
@@ -26,17 +33,158 @@ dict_unicode_inverted = {
     (1, 1): FB,
 }
 
+# The bit of the dot in row k and column j of a braille cell, which is added to
+# BRAILLE_BLANK to get the braille pattern with that dot raised
+BRAILLE_BLANK = "\N{BRAILLE PATTERN BLANK}"
+braille_dot_bits = {
+    (0, 0): 0,
+    (1, 0): 1,
+    (2, 0): 2,
+    (0, 1): 3,
+    (1, 1): 4,
+    (2, 1): 5,
+    (3, 0): 6,
+    (3, 1): 7,
+}
+
+# Number of pixel rows which are converted at once
+_BLOCK_ROWS = 1024
+
+
+def _decoding_table(char_for: dict[tuple[int, int], str]) -> str:
+    """Build a charmap decoding table from the codes top + 2 * bottom to characters."""
+    table = ["\ufffe"] * 256
+    for (top, bottom), char in char_for.items():
+        table[top + 2 * bottom] = char
+    return "".join(table)
+
+
+_decoding_table_normal = _decoding_table(dict_unicode)
+_decoding_table_inverted = _decoding_table(dict_unicode_inverted)
+
+# Lookup table for Image.point, which maps blank pixels to 0 and others to 1
+_BINARIZE = [0] + [1] * 255
+
+# The pixels of a braille cell in the order in which they are packed into codes,
+# from the highest bit of the code to the lowest
+_BRAILLE_PIXELS = sorted(braille_dot_bits, reverse=True)
+
+
+def _braille_decoding_table(invert: bool) -> str:
+    """Build a charmap decoding table from packed braille cells to characters."""
+    table = []
+    for code in range(256):
+        pattern = 0
+        for i, position in enumerate(reversed(_BRAILLE_PIXELS)):
+            if bool(code & (1 << i)) == invert:
+                pattern |= 1 << braille_dot_bits[position]
+        table.append(chr(ord(BRAILLE_BLANK) + pattern))
+    return "".join(table)
+
+
+_braille_decoding_table_normal = _braille_decoding_table(invert=False)
+_braille_decoding_table_inverted = _braille_decoding_table(invert=True)
 
-def image_to_unicode(im: Image, invert: bool = False) -> str:
-    char_for = dict_unicode_inverted if invert else dict_unicode
+
+def iter_pixel_blocks(
+    im: Image, cell_rows: int, cell_columns: int = 1
+) -> Iterator[list[list[Image]]]:
+    """Split an image into blocks of cells, with one image per pixel of a cell.
+
+    For cells of cell_rows by cell_columns pixels, the image at [k][j] of a block
+    holds the pixel in row k and column j of every cell, so that per-cell codes can
+    be computed with whole-image operations. The image is converted block by block,
+    so memory use doesn't grow with its height. Blank pixels are added at the right
+    and at the bottom to fill the last cells.
+
+    The pixels of the blocks are 0 for blank pixels, and 1 otherwise.
+    """
+    width = im.width + (-im.width % cell_columns)
+    cells_per_row = width // cell_columns
+    block_rows = _BLOCK_ROWS - _BLOCK_ROWS % cell_rows
+    for block_top in range(0, im.height, block_rows):
+        block_height = min(block_rows, im.height - block_top)
+        block_height += -block_height % cell_rows
+        num_cell_rows = block_height // cell_rows
+        # Cropping beyond the edges of the image adds blank pixels
+        block = im.crop((0, block_top, width, block_top + block_height))
+        block = block.convert("L").point(_BINARIZE)
+        # Reading the pixels of cell_rows consecutive rows as a single row puts
+        # each row of a cell side by side, and reading the pixels of a row in
+        # groups of cell_columns puts each column of a cell side by side.
+        cells = PILImage.frombytes(
+            "L", (width * cell_rows, num_cell_rows), block.tobytes()
+        )
+        pixel_images = []
+        for k in range(cell_rows):
+            cell_row = cells.crop((k * width, 0, (k + 1) * width, num_cell_rows))
+            if cell_columns == 1:
+                pixel_images.append([cell_row])
+                continue
+            columns = PILImage.frombytes(
+                "L", (cell_columns, cells_per_row * num_cell_rows), cell_row.tobytes()
+            )
+            pixel_images.append(
+                [
+                    PILImage.frombytes(
+                        "L",
+                        (cells_per_row, num_cell_rows),
+                        columns.crop((j, 0, j + 1, columns.height)).tobytes(),
+                    )
+                    for j in range(cell_columns)
+                ]
+            )
+        yield pixel_images
+
+
+def iter_image_to_unicode(im: Image, invert: bool = False) -> Iterator[str]:
+    """Yield the lines of the unicode preview of an image one by one.
+
+    Each character shows two vertically adjacent pixels. Pixel pairs are packed into
+    the 2-bit codes top + 2 * bottom with image operations, and the codes are
+    decoded into characters with a charmap table.
+    """
+    table = _decoding_table_inverted if invert else _decoding_table_normal
     width = im.width
-    height = im.height + (im.height % 2)
-    padded_im = pad(image=im, size=(width, height))
-    a = padded_im.load()
-    output_rows = []
-    for r in range(0, height, 2):
-        char_list = [char_for[(a[c, r], a[c, r + 1])] for c in range(width)]
-        row = "".join(char_list)
-        output_rows.append(row)
-    output_str = "\n".join(output_rows)
-    return output_str
+    for (top,), (bottom,) in iter_pixel_blocks(im, 2):
+        codes = ImageChops.add(ImageChops.add(top, bottom), bottom)
+        chars, _ = codecs.charmap_decode(codes.tobytes(), "strict", table)
+        for offset in range(0, len(chars), width):
+            yield chars[offset : offset + width]
+
+
+def iter_image_to_braille(im: Image, invert: bool = False) -> Iterator[str]:
+    """Yield the lines of the braille preview of an image one by one.
+
+    Each braille pattern shows a cell of 2x4 pixels, which is 4 times denser than
+    the preview of iter_image_to_unicode. Like there, blank pixels are drawn (as
+    raised dots) unless the preview is inverted.
+    """
+    if invert:
+        table = _braille_decoding_table_inverted
+    else:
+        table = _braille_decoding_table_normal
+    for pixel_images in iter_pixel_blocks(im, 4, 2):
+        # Pack the pixels of each cell into a byte by doubling and adding
+        codes, *pixels = (pixel_images[k][j] for k, j in _BRAILLE_PIXELS)
+        for pixel in pixels:
+            codes = ImageChops.add(ImageChops.add(codes, codes), pixel)
+        chars, _ = codecs.charmap_decode(codes.tobytes(), "strict", table)
+        for offset in range(0, len(chars), codes.width):
+            yield chars[offset : offset + codes.width]
+
+
+def image_to_unicode(im: Image, invert: bool = False, braille: bool = False) -> str:
+    iter_lines = iter_image_to_braille if braille else iter_image_to_unicode
+    return "\n".join(iter_lines(im, invert=invert))
+
+
+def print_image_as_unicode(
+    im: Image, invert: bool = False, braille: bool = False, file: TextIO | None = None
+) -> None:
+    """Write the unicode preview of an image line by line as it is produced."""
+    file = file or sys.stdout
+    iter_lines = iter_image_to_braille if braille else iter_image_to_unicode
+    for line in iter_lines(im, invert=invert):
+        file.write(line)
+        file.write("\n")